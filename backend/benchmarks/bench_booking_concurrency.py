@@ -0,0 +1,132 @@
+"""Concurrent guest bookings: the old find-then-insert path vs the guest upsert, against a local replica set.
+
+Fires bookings for a small pool of new guest emails at /api/bookings/create
+(in-process, no HTTP server) and reports latency and how many emails ended up
+with more than one guest user. The legacy mode swaps in the pre-upsert
+find_one / insert_one guest lookup and drops the guest unique index.
+
+Start a single-node replica set first, e.g.
+    mongod --replSet rs0 --dbpath /tmp/rs0 & mongosh --eval "rs.initiate()"
+
+Usage: MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0 python benchmarks/bench_booking_concurrency.py [--bookings 2000] [--emails 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017/?replicaSet=rs0")
+os.environ.setdefault("DB_NAME", "luxury_stay_booking_bench")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# Every booking takes the same hotel and nights; keep inventory from rejecting them before guest creation
+os.environ.setdefault("ROOMS_PER_HOTEL", "1000000")
+
+import server  # noqa: E402
+from server import upsert_guest_user  # noqa: E402
+from db_indexes import INDEX_SPECS, ensure_indexes  # noqa: E402
+
+MODES = ("legacy", "upsert", "transaction")
+
+
+async def legacy_guest_user(booking_request, session=None) -> str:
+    """Guest lookup as create_booking did it before the upsert: find_one, then insert_one on a miss"""
+    guest_user = await server.db.users.find_one({"email": booking_request.guest_email}, {"_id": 0})
+    if guest_user:
+        return guest_user["user_id"]
+    user_id = f"guest_{uuid.uuid4().hex[:12]}"
+    await server.db.users.insert_one({
+        "user_id": user_id,
+        "email": booking_request.guest_email,
+        "name": f"{booking_request.guest_first_name} {booking_request.guest_last_name}",
+        "picture": "",
+        "created_at": datetime.now(timezone.utc),
+        "is_guest": True,
+    })
+    return user_id
+
+
+async def run(mode: str, args) -> dict:
+    await server.client.drop_database(os.environ["DB_NAME"])
+    specs = dict(INDEX_SPECS)
+    if mode == "legacy":
+        specs["users"] = [model for model in specs["users"] if "partialFilterExpression" not in model.document]
+    await ensure_indexes(server.db, specs)
+    server.MONGO_TRANSACTIONS = mode == "transaction"
+    server.upsert_guest_user = legacy_guest_user if mode == "legacy" else upsert_guest_user
+
+    run_id = uuid.uuid4().hex[:6]
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench") as http:
+        async def one(i: int):
+            nonlocal failures
+            payload = {
+                "hotel_id": 1001,
+                "check_in": "2026-01-01",
+                "check_out": "2026-01-03",
+                "guest_first_name": "Guest",
+                "guest_last_name": str(i),
+                "guest_email": f"guest_{run_id}_{i % args.emails}@example.com",
+                "num_adults": 2,
+                "num_children": 0,
+                "total_price": 250.0,
+            }
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    (await http.post("/api/bookings/create", json=payload)).raise_for_status()
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.bookings)))
+        elapsed = time.perf_counter() - started
+
+    duplicated = await server.db.users.aggregate([
+        {"$group": {"_id": "$email", "users": {"$sum": 1}}},
+        {"$match": {"users": {"$gt": 1}}},
+    ]).to_list(None)
+    latencies.sort()
+    return {
+        "throughput": args.bookings / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "failures": failures,
+        "users": await server.db.users.count_documents({}),
+        "duplicated_emails": len(duplicated),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--emails", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    try:
+        for mode in args.modes:
+            r = await run(mode, args)
+            print(
+                f"{mode:<12} {r['throughput']:7.0f} bookings/s  p50={r['p50'] * 1000:6.2f}ms  p99={r['p99'] * 1000:6.2f}ms  "
+                f"failures={r['failures']}  users={r['users']} (expected {args.emails})  duplicated emails={r['duplicated_emails']}"
+            )
+    finally:
+        await server.client.drop_database(os.environ["DB_NAME"])
+        server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Compare loading the extended catalog by importing Python source vs the compact file.
+
+Each strategy runs in a fresh interpreter so module caches don't leak between runs:
+  import (cold)  - extended_hotels.py compiled from source, as on a fresh instance
+  import (pyc)   - extended_hotels.py with a warm __pycache__
+  compact        - catalog_store.read_catalog on the .cat file
+
+Usage: python benchmarks/bench_catalog_load.py [--scale 100] [--runs 5]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from catalog_store import read_source, write_catalog  # noqa: E402
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); from extended_hotels import EXTENDED_HOTELS; print(time.perf_counter() - t)"
+COMPACT_SNIPPET = (
+    "import time; from catalog_store import read_catalog; t = time.perf_counter(); "
+    "read_catalog('extended_hotels.cat', check_source=True); print(time.perf_counter() - t)"
+)
+
+
+def timed(snippet: str, cwd: Path, extra_path: Path, env_extra=None) -> float:
+    env = {"PYTHONPATH": f"{cwd}:{extra_path}", **(env_extra or {})}
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1, help="replicate the extended catalog this many times")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    hotels = read_source(BACKEND_DIR / "extended_hotels.py")
+    hotels = [dict(h, id=100000 + i) for i, h in enumerate(hotels * args.scale)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        source = workdir / "extended_hotels.py"
+        source.write_text("EXTENDED_HOTELS = [\n" + ",\n".join(f"    {h!r}" for h in hotels) + "\n]\n")
+        size = write_catalog(workdir / "extended_hotels.cat", hotels, source)
+
+        results = {
+            "import (cold)": [timed(IMPORT_SNIPPET, workdir, BACKEND_DIR, {"PYTHONDONTWRITEBYTECODE": "1"}) for _ in range(args.runs)],
+        }
+        timed(IMPORT_SNIPPET, workdir, BACKEND_DIR)
+        results["import (pyc)"] = [timed(IMPORT_SNIPPET, workdir, BACKEND_DIR) for _ in range(args.runs)]
+        results["compact"] = [timed(COMPACT_SNIPPET, workdir, BACKEND_DIR) for _ in range(args.runs)]
+
+        print(f"hotels={len(hotels)} source={source.stat().st_size} bytes compact={size} bytes")
+        for name, samples in results.items():
+            print(f"{name:<14} median={statistics.median(samples) * 1000:8.2f}ms  min={min(samples) * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Memory footprint of a synthetic catalog as plain dicts vs interned HotelRecords.
+
+Rows are produced by json.loads, like a catalog read from an API or file, so
+every row starts out with its own copies of repeated strings and lists.
+
+With --server, instead reports what `import server` itself retains (traced
+Python allocations and RSS) in a fresh interpreter, i.e. the real catalog
+load path including every copy of the rows the server keeps.
+
+Usage: python benchmarks/bench_catalog_memory.py [--size 100000] [--server]
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog import Interner  # noqa: E402
+from catalog_store import read_source  # noqa: E402
+
+
+def synthetic_rows(size: int) -> str:
+    base = read_source(Path(__file__).resolve().parent.parent / "extended_hotels.py")
+    rows = [dict(base[i % len(base)], id=100000 + i) for i in range(size)]
+    return json.dumps(rows)
+
+
+SERVER_SNIPPET = (
+    "import gc, resource, tracemalloc; tracemalloc.start(); import server; gc.collect(); "
+    "print(tracemalloc.get_traced_memory()[0], len(server.hotel_catalog), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+
+def server_load_path() -> None:
+    backend = Path(__file__).resolve().parent.parent
+    env = {**os.environ, "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://localhost:27017"), "DB_NAME": "luxury_stay_bench"}
+    out = subprocess.run([sys.executable, "-c", SERVER_SNIPPET], cwd=backend, env=env, capture_output=True, text=True, check=True)
+    traced, hotels, peak_kb = (int(value) for value in out.stdout.split())
+    print(f"import server: hotels={hotels} traced={traced / 2**10:.0f} KiB peak_rss={peak_kb / 1024:.1f} MiB")
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--server", action="store_true", help="measure the server's own catalog load instead")
+    args = parser.parse_args()
+    if args.server:
+        server_load_path()
+        return
+
+    payload = synthetic_rows(args.size)
+    dicts, dict_bytes = measure(lambda: json.loads(payload))
+    del dicts
+
+    def compact():
+        interner = Interner()
+        return [interner.record(row) for row in json.loads(payload)]
+
+    records, record_bytes = measure(compact)
+    assert len(records) == args.size
+
+    print(f"hotels={args.size}")
+    print(f"dicts          {dict_bytes / 2**20:8.1f} MiB  {dict_bytes / args.size:7.0f} B/hotel")
+    print(f"HotelRecord    {record_bytes / 2**20:8.1f} MiB  {record_bytes / args.size:7.0f} B/hotel")
+    print(f"saving         {(1 - record_bytes / dict_bytes) * 100:7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Micro-benchmarks for the search hot path: catalog filtering and HotelInfo serialization.
+
+Each case reports microseconds per operation (best of --repeat runs) and its
+time relative to the calibration workload in report.py, which is what is
+compared against the "micro" section of benchmarks/baseline.json.
+
+Usage: python benchmarks/bench_micro.py [--repeat 5] [--save-baseline] [--tolerance 0.25]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "luxury_stay_bench")
+
+import server  # noqa: E402
+from report import add_baseline_arguments, finish, rss_mb, time_relative  # noqa: E402
+
+RANGES = {"price": (None, 12000.0), "rating": (8.0, None)}
+
+
+def cases():
+    catalog = server.hotel_catalog
+    views, index = catalog.views, catalog.index
+    hotels = catalog.hotels
+    goa = index.search("goa")
+    page = views.select(None, sort_by="recommended", limit=20)[0]
+    hotel_list = TypeAdapter(List[server.HotelInfo])
+    request = server.HotelSearchRequest(destination="India", check_in="2027-01-01", check_out="2027-01-03", sort_by="price", limit=20)
+
+    return {
+        "index.search substring": lambda: index.search("mum"),
+        "index.search catalog-wide": lambda: index.search("India"),
+        "select recommended page": lambda: views.select(None, sort_by="recommended", limit=20),
+        "select filtered+sorted page": lambda: views.select(None, sort_by="price", ranges=RANGES, amenities=["Pool"], limit=20),
+        "select candidates sorted": lambda: views.select(goa, sort_by="rating", descending=True),
+        "select seeded shuffle": lambda: views.select(None, seed="bench", limit=20),
+        "select_page from request": lambda: server.select_page(views, None, request),
+        "HotelInfo build+dump x20": lambda: [server.HotelInfo(**hotels[i]).model_dump_json() for i in page],
+        "List[HotelInfo] dump x20": lambda: hotel_list.dump_json([server.HotelInfo(**hotels[i]) for i in page]),
+        "pre-encoded array x20": lambda: catalog.payloads.array(page),
+        "destination suggest": lambda: server.destination_index.suggest("barcelna"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in cases().items():
+        results[name] = time_relative(fn, args.repeat, args.min_time)
+        print(f"{name:<30} {results[name]['us_per_op']:>10.2f} us  x{results[name]['relative']:.4f}")
+    results["process"] = rss_mb()
+    print("process:", results["process"])
+    finish("micro", results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Query latency with and without the declared indexes, against a local mongod.
+
+Seeds a scratch database with bookings, users, sessions and payments, times the
+lookups server.py performs, then runs db_indexes.ensure_indexes and times them
+again. The scratch database is dropped afterwards unless --keep is given.
+
+Usage: MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_mongo_indexes.py [--bookings 2000000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db_indexes import ensure_indexes  # noqa: E402
+
+BATCH = 10000
+
+
+async def seed(db, bookings: int, users: int):
+    now = datetime.now(timezone.utc)
+    for start in range(0, users, BATCH):
+        await db.users.insert_many([{"user_id": f"user_{i}", "email": f"user_{i}@example.com", "name": f"User {i}"} for i in range(start, min(users, start + BATCH))])
+        await db.user_sessions.insert_many([
+            {"user_id": f"user_{i}", "session_token": f"token_{i}", "expires_at": now + timedelta(days=7), "created_at": now}
+            for i in range(start, min(users, start + BATCH))
+        ])
+    for start in range(0, bookings, BATCH):
+        docs = []
+        for i in range(start, min(bookings, start + BATCH)):
+            docs.append({
+                "booking_id": f"booking_{i}",
+                "user_id": f"user_{i % users}",
+                "hotel_id": 1001 + i % 140,
+                "status": "confirmed",
+                "check_in": "2026-01-01",
+                "check_out": "2026-01-03",
+                "total_price": 100.0,
+                "created_at": (now - timedelta(minutes=i)).isoformat(),
+            })
+        await db.bookings.insert_many(docs)
+        await db.payment_transactions.insert_many([{"session_id": f"session_{d['booking_id']}", "booking_id": d["booking_id"], "payment_status": "pending"} for d in docs])
+        print(f"\rseeded {start + len(docs)}/{bookings} bookings", end="", flush=True)
+    print()
+
+
+def queries(bookings: int, users: int):
+    booking = random.randrange(bookings)
+    user = random.randrange(users)
+    return {
+        "bookings.booking_id": lambda db: db.bookings.find_one({"booking_id": f"booking_{booking}"}, {"_id": 0}),
+        "bookings.user_id": lambda db: db.bookings.find({"user_id": f"user_{user}"}, {"_id": 0}).to_list(100),
+        "user_sessions.session_token": lambda db: db.user_sessions.find_one({"session_token": f"token_{user}"}, {"_id": 0}),
+        "users.user_id": lambda db: db.users.find_one({"user_id": f"user_{user}"}, {"_id": 0}),
+        "payment_transactions.session_id": lambda db: db.payment_transactions.find_one({"session_id": f"session_booking_{booking}"}, {"_id": 0}),
+    }
+
+
+async def measure(db, args):
+    results = {}
+    for name in queries(args.bookings, args.users):
+        samples = []
+        for _ in range(args.samples):
+            query = queries(args.bookings, args.users)[name]
+            started = time.perf_counter()
+            await query(db)
+            samples.append(time.perf_counter() - started)
+        results[name] = statistics.median(samples)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--database", default="luxury_stay_index_bench")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.database]
+    await client.drop_database(args.database)
+    try:
+        await seed(db, args.bookings, args.users)
+        before = await measure(db, args)
+        started = time.perf_counter()
+        report = await ensure_indexes(db)
+        print(f"ensure_indexes: {time.perf_counter() - started:.1f}s, created {len(report['created'])}")
+        after = await measure(db, args)
+
+        print(f"{'query':<34} {'no index ms':>12} {'indexed ms':>11} {'speedup':>8}")
+        for name in before:
+            print(f"{name:<34} {before[name] * 1000:>12.2f} {after[name] * 1000:>11.2f} {before[name] / after[name]:>7.0f}x")
+    finally:
+        if not args.keep:
+            await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""Compare HotelSearchIndex lookups against the original list-comprehension scan.
+
+Usage: python benchmarks/bench_search_index.py [--size 50000] [--repeat 200]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog import HotelSearchIndex  # noqa: E402
+from extended_hotels import EXTENDED_HOTELS  # noqa: E402
+
+QUERIES = ["Mumbai", "goa", "del", "India", "a", "shimla", "Atlantis", ""]
+
+
+def synthetic_catalog(size: int):
+    """Scale EXTENDED_HOTELS up, spreading rows over many distinct cities"""
+    hotels = []
+    for i in range(size):
+        base = EXTENDED_HOTELS[i % len(EXTENDED_HOTELS)]
+        hotel = dict(base)
+        hotel["id"] = 100000 + i
+        hotel["city"] = f"{base['city']} {i // len(EXTENDED_HOTELS) % 200}"
+        hotels.append(hotel)
+    return hotels
+
+
+def linear_scan(hotels, destination):
+    return [h for h in hotels if destination.lower() in h["city"].lower() or destination.lower() in h["country"].lower()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    hotels = synthetic_catalog(args.size)
+    build = timeit.timeit(lambda: HotelSearchIndex(hotels), number=1)
+    index = HotelSearchIndex(hotels)
+    print(f"catalog={len(hotels)} index build={build * 1000:.1f}ms")
+    print(f"{'query':<10} {'hits':>7} {'scan us':>10} {'index us':>10} {'speedup':>8}")
+
+    for query in QUERIES:
+        expected = linear_scan(hotels, query)
+        actual = [hotels[i] for i in index.search(query)]
+        assert actual == expected, f"index disagrees with scan for {query!r}"
+
+        scan = timeit.timeit(lambda: linear_scan(hotels, query), number=max(1, args.repeat // 20)) / max(1, args.repeat // 20)
+        indexed = timeit.timeit(lambda: [hotels[i] for i in index.search(query)], number=args.repeat) / args.repeat
+        print(f"{query!r:<10} {len(expected):>7} {scan * 1e6:>10.1f} {indexed * 1e6:>10.1f} {scan / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
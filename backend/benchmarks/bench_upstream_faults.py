@@ -0,0 +1,244 @@
+"""Booking.com failure handling: retries, circuit breaker and stale-while-revalidate under injected faults.
+
+Runs the app in-process on mongomock against the local stub with real-API
+mode on. First a set of deterministic checks, each on a fresh breaker and
+retry budget:
+
+  retries        a failing upstream is tried BOOKING_MAX_ATTEMPTS times, a stalled one
+                 only until BOOKING_API_DEADLINE, and not retried with an empty budget
+  breaker        opens after its failure threshold, answers 503 with Retry-After without
+                 calling upstream, lets one trial through after the reset timeout and
+                 closes again once the upstream recovers
+  stale          an expired entry is answered straight away while a refresh runs,
+                 and the refresh replaces it
+
+then searches driven through four phases:
+
+  healthy        no faults; fills hotel_cache; every search should succeed
+  flaky          a share of upstream calls fail or stall; new dates, so every search goes upstream
+  outage/stale   upstream down, cached entries expired; should be answered stale, with 200s
+  outage/cold    upstream down, nothing cached; should fail fast with 503 once the breaker opens
+
+Exits 1 if any check fails.
+
+Usage: python benchmarks/bench_upstream_faults.py [--searches 400] [--error-rate 0.3] [--hang-rate 0.05]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from report import summarize  # noqa: E402
+
+CITIES = ["new york", "paris", "london", "miami", "tokyo", "barcelona", "dubai", "rome"]
+
+failures = []
+
+
+def check(ok: bool, what: str) -> None:
+    print(f"  {'ok  ' if ok else 'FAIL'} {what}")
+    if not ok:
+        failures.append(what)
+
+
+def search_body(i: int, day: int, month: int = 5) -> dict:
+    return {"destination": CITIES[i % len(CITIES)], "check_in": f"2027-{month:02d}-{day:02d}", "check_out": f"2027-{month:02d}-{day + 1:02d}"}
+
+
+async def setup(args):
+    import stub_booking
+
+    stub_booking.settings.latency_ms = args.upstream_latency_ms
+    stub = stub_booking.run_in_thread()
+    os.environ.update(MONGO_URL="mongodb://localhost:27017", DB_NAME="luxury_stay_faults", BOOKING_API_KEY="faults", BOOKING_API_BASE_URL=stub)
+    os.environ.setdefault("BOOKING_API_DEADLINE", str(args.deadline))
+    os.environ.setdefault("BOOKING_BREAKER_RESET_SECONDS", "5")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    import server
+    from mongomock_motor import AsyncMongoMockClient
+
+    server.db = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://faults", timeout=120.0)
+    return stub_booking.settings, server, http
+
+
+def reset_upstream_state(server, failure_threshold: int, reset_timeout: float, retry_budget=None) -> None:
+    from resilience import CircuitBreaker, RetryBudget
+
+    server.booking_breaker = CircuitBreaker("booking", failure_threshold, reset_timeout)
+    server.booking_retry_budget = retry_budget or RetryBudget()
+
+
+async def timed_search(http: httpx.AsyncClient, body: dict):
+    started = time.perf_counter()
+    response = await http.post("/api/hotels/search", json=body)
+    return response, time.perf_counter() - started
+
+
+async def check_retries(http: httpx.AsyncClient, server, faults):
+    from resilience import RetryBudget
+
+    print("retries")
+    reset_upstream_state(server, failure_threshold=1000, reset_timeout=60)
+    faults.down, calls = True, faults.calls
+    response, elapsed = await timed_search(http, search_body(0, day=1, month=6))
+    # Worst case backoff: the full jitter range before every retry
+    backoff = sum(min(2.0, 0.1 * 2 ** attempt) for attempt in range(1, server.BOOKING_MAX_ATTEMPTS))
+    check(response.status_code == 503, f"upstream down: 503 (got {response.status_code})")
+    check(faults.calls - calls == server.BOOKING_MAX_ATTEMPTS, f"upstream down: {server.BOOKING_MAX_ATTEMPTS} attempts (got {faults.calls - calls})")
+    check(elapsed < backoff + 1.0, f"upstream down: retries done within {backoff + 1.0:.1f}s (took {elapsed:.2f}s)")
+
+    faults.down, faults.hang_rate, faults.hang_ms = False, 1.0, 3000.0
+    deadline, server.BOOKING_API_DEADLINE = server.BOOKING_API_DEADLINE, 0.5
+    calls = faults.calls
+    response, elapsed = await timed_search(http, search_body(0, day=2, month=6))
+    server.BOOKING_API_DEADLINE, faults.hang_rate = deadline, 0.0
+    check(response.status_code == 503, f"upstream stalled: 503 (got {response.status_code})")
+    check(faults.calls - calls == 1, f"upstream stalled: no retry past the deadline (got {faults.calls - calls} attempts)")
+    check(elapsed < 1.0, f"upstream stalled: gave up at the 0.5s deadline (took {elapsed:.2f}s)")
+
+    reset_upstream_state(server, failure_threshold=1000, reset_timeout=60, retry_budget=RetryBudget(ratio=0, min_per_second=0, capacity=0))
+    faults.down, calls = True, faults.calls
+    response, _ = await timed_search(http, search_body(0, day=3, month=6))
+    check(faults.calls - calls == 1, f"retry budget spent: a single attempt (got {faults.calls - calls})")
+    faults.down = False
+
+
+async def check_breaker(http: httpx.AsyncClient, server, faults):
+    print("breaker")
+    reset_timeout = 1.0
+    reset_upstream_state(server, failure_threshold=5, reset_timeout=reset_timeout)
+    breaker = server.booking_breaker
+    faults.down, calls = True, faults.calls
+    for day in range(1, 10):
+        await timed_search(http, search_body(1, day=day, month=7))
+        if breaker.state == "open":
+            break
+    check(breaker.state == "open", f"opened after upstream failures (state {breaker.state})")
+    check(faults.calls - calls == breaker.failure_threshold, f"opened after {breaker.failure_threshold} failed calls (got {faults.calls - calls})")
+
+    calls = faults.calls
+    response, elapsed = await timed_search(http, search_body(1, day=11, month=7))
+    retry_after = response.headers.get("retry-after")
+    check(response.status_code == 503, f"open: 503 (got {response.status_code})")
+    check(retry_after is not None and int(retry_after) >= 1, f"open: Retry-After header (got {retry_after})")
+    check(faults.calls == calls, f"open: upstream not called (got {faults.calls - calls} calls)")
+    check(elapsed < 0.5, f"open: failed fast (took {elapsed:.2f}s)")
+
+    await asyncio.sleep(reset_timeout + 0.1)
+    calls = faults.calls
+    response, _ = await timed_search(http, search_body(1, day=12, month=7))
+    check(faults.calls - calls == 1, f"half-open: a single trial call (got {faults.calls - calls})")
+    check(response.status_code == 503 and breaker.state == "open", f"half-open: failed trial reopens (state {breaker.state})")
+
+    await asyncio.sleep(reset_timeout + 0.1)
+    faults.down = False
+    response, _ = await timed_search(http, search_body(1, day=13, month=7))
+    check(response.status_code == 200, f"recovered: 200 (got {response.status_code})")
+    check(breaker.state == "closed", f"recovered: closed after a successful trial (state {breaker.state})")
+
+
+async def check_stale(http: httpx.AsyncClient, server, faults):
+    print("stale")
+    reset_upstream_state(server, failure_threshold=1000, reset_timeout=60)
+    body = search_body(2, day=1, month=8)
+    response, _ = await timed_search(http, body)
+    check(response.status_code == 200, f"cache filled: 200 (got {response.status_code})")
+    expired = datetime.now(timezone.utc) - timedelta(minutes=5)
+    await server.db.hotel_cache.update_many({"check_in": body["check_in"]}, {"$set": {"expires_at": expired}})
+    server.hotel_search_cache.memory.clear()
+
+    latency, faults.latency_ms = faults.latency_ms, 500.0
+    stale_hits, calls = server.hotel_search_cache.stale_hits, faults.calls
+    response, elapsed = await timed_search(http, body)
+    check(response.status_code == 200 and response.json(), f"expired entry: 200 with results (got {response.status_code})")
+    check(elapsed < 0.5, f"expired entry: answered without waiting on upstream (took {elapsed:.2f}s)")
+    check(server.hotel_search_cache.stale_hits == stale_hits + 1, "expired entry: counted as a stale hit")
+    check(server.cache_revalidator.stats()["in_flight"] == 1, f"expired entry: refresh running ({server.cache_revalidator.stats()})")
+
+    for _ in range(50):
+        if not server.cache_revalidator.stats()["in_flight"]:
+            break
+        await asyncio.sleep(0.1)
+    faults.latency_ms = latency
+    newest = await server.db.hotel_cache.find_one({"check_in": body["check_in"]}, sort=[("expires_at", -1)])
+    check(faults.calls - calls == 1, f"refresh: one upstream call (got {faults.calls - calls})")
+    check(newest is not None and newest["expires_at"].replace(tzinfo=timezone.utc) > datetime.now(timezone.utc), "refresh: entry replaced with a fresh one")
+
+
+async def run_phase(name: str, http: httpx.AsyncClient, server, args, day: int) -> Counter:
+    statuses = Counter()
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await http.post("/api/hotels/search", json=search_body(i, day))
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.searches)))
+    row = summarize(latencies, time.perf_counter() - started)
+    print(f"{name:<14} statuses={dict(statuses)} p50={row['p50_ms']:.1f}ms p99={row['p99_ms']:.1f}ms")
+    print(f"{'':<14} breaker={server.booking_breaker.stats()} retry_budget={server.booking_retry_budget.stats()}")
+    print(f"{'':<14} stale_hits={server.hotel_search_cache.stale_hits} revalidation={server.cache_revalidator.stats()}")
+    return statuses
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--searches", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--hang-rate", type=float, default=0.05)
+    parser.add_argument("--hang-ms", type=float, default=2000.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0)
+    parser.add_argument("--deadline", type=float, default=5.0, help="BOOKING_API_DEADLINE for the run")
+    args = parser.parse_args()
+
+    faults, server, http = await setup(args)
+    async with http:
+        breaker, retry_budget = server.booking_breaker, server.booking_retry_budget
+        await check_retries(http, server, faults)
+        await check_breaker(http, server, faults)
+        await check_stale(http, server, faults)
+        server.booking_breaker, server.booking_retry_budget = breaker, retry_budget
+
+        statuses = await run_phase("healthy", http, server, args, day=1)
+        check(set(statuses) == {200}, "healthy: every search answered 200")
+
+        faults.error_rate, faults.hang_rate, faults.hang_ms = args.error_rate, args.hang_rate, args.hang_ms
+        statuses = await run_phase("flaky", http, server, args, day=3)
+        check(set(statuses) <= {200, 503}, "flaky: only 200s and 503s")
+
+        faults.down = True
+        expired = datetime.now(timezone.utc) - timedelta(minutes=5)
+        await server.db.hotel_cache.update_many({}, {"$set": {"expires_at": expired}})
+        server.hotel_search_cache.memory.clear()
+        statuses = await run_phase("outage/stale", http, server, args, day=1)
+        check(set(statuses) == {200}, "outage/stale: every search answered 200 from the stale cache")
+        statuses = await run_phase("outage/cold", http, server, args, day=5)
+        check(set(statuses) == {503}, "outage/cold: every search answered 503")
+        check(server.booking_breaker.state == "open", "outage/cold: breaker open")
+        await server.cache_revalidator.close()
+
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
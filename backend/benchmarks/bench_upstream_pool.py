@@ -0,0 +1,67 @@
+"""Per-request httpx.AsyncClient vs the shared UpstreamClient pool, against the local stub.
+
+Usage: python benchmarks/bench_upstream_pool.py [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_booking import run_in_thread  # noqa: E402
+from upstream import UpstreamClient  # noqa: E402
+
+PAYLOAD = {"city": -2601889, "checkin": "2026-01-01", "checkout": "2026-01-02"}
+
+
+async def per_request(url: str):
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.post(url, json=PAYLOAD)
+        response.raise_for_status()
+
+
+async def drive(call, total: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return total / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    url = run_in_thread() + "/accommodations/search"
+    pooled = UpstreamClient("bench", "BENCH", max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async def shared():
+        response = await pooled.post(url, json=PAYLOAD)
+        response.raise_for_status()
+
+    for name, call in (("per-request client", lambda: per_request(url)), ("shared pool", shared)):
+        throughput, p50, p99 = await drive(call, args.requests, args.concurrency)
+        print(f"{name:<20} {throughput:8.0f} req/s  p50={p50 * 1000:6.2f}ms  p99={p99 * 1000:6.2f}ms")
+    print("pool stats:", pooled.stats())
+    await pooled.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+"""Mixed-traffic load test for the backend API.
+
+By default the app runs in-process (httpx ASGI transport, no sockets) on a
+mongomock database, with Booking.com and the OAuth service served by the local
+stub. --mongo-url uses a real mongod instead, --mock-catalog serves the mock
+catalog rather than stubbed Booking.com results, and --url drives an already
+running server (uvicorn/gunicorn).
+
+Reports throughput and p50/p95/p99 per endpoint, plus RSS, and compares them
+against benchmarks/baseline.json (exit status 1 on regression).
+
+Usage: python benchmarks/loadtest.py [--requests 5000] [--concurrency 50] [--save-baseline]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from report import add_baseline_arguments, calibrate, finish, rss_mb, summarize  # noqa: E402
+
+# Relative weights of each request type in the mix
+MIX = {
+    "search": 45,
+    "details": 25,
+    "bookings": 10,
+    "create_booking": 10,
+    "checkout_status": 10,
+}
+CITIES = ["new york", "paris", "london", "miami", "tokyo", "barcelona", "dubai", "rome"]
+MOCK_DESTINATIONS = ["Goa", "Mumbai", "India", "Delhi", "Jaipur", "Manali", "Kerala", "Shimla"]
+
+
+async def setup_app(args) -> httpx.AsyncClient:
+    """Import the app against the chosen database and upstream; returns an in-process client"""
+    os.environ.setdefault("MONGO_URL", args.mongo_url or "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "luxury_stay_loadtest")
+    os.environ.setdefault("ROOMS_PER_HOTEL", "100000")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    import stub_booking
+
+    stub_booking.settings.latency_ms = args.upstream_latency_ms
+    stub = stub_booking.run_in_thread()
+    if not args.mock_catalog:
+        os.environ.update(BOOKING_API_KEY="loadtest", BOOKING_API_BASE_URL=stub)
+
+    import server
+    from db_indexes import INDEX_SPECS
+
+    server.AUTH_SESSION_URL = stub + "/auth/v1/env/oauth/session-data"
+    if args.mongo_url:
+        await server.client.drop_database(os.environ["DB_NAME"])
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.db = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    for collection, models in INDEX_SPECS.items():
+        try:
+            await server.db[collection].create_indexes(models)
+        except Exception as e:
+            print(f"index on {collection} skipped: {e}")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://loadtest", timeout=60.0)
+
+
+def booking_payload(rng: random.Random, hotel_ids: List[int]) -> Dict:
+    day = rng.randrange(1, 27)
+    return {
+        "hotel_id": rng.choice(hotel_ids),
+        "check_in": f"2027-03-{day:02d}",
+        "check_out": f"2027-03-{day + rng.randrange(1, 3):02d}",
+        "guest_first_name": "Load",
+        "guest_last_name": "Test",
+        "guest_email": f"guest{rng.randrange(500)}@example.com",
+        "num_adults": 2,
+        "total_price": 250.0,
+    }
+
+
+async def prepare(http: httpx.AsyncClient, args) -> Dict:
+    """Log in, and create the bookings and checkout sessions later requests read back"""
+    state = {"headers": {}, "sessions": [], "hotel_ids": [1001, 1002, 1003, 1004, 1005]}
+    if args.session_token:
+        state["headers"] = {"Authorization": f"Bearer {args.session_token}"}
+    elif args.url is None:
+        response = await http.post("/api/auth/session", json={"session_id": "loadtest"})
+        response.raise_for_status()
+        state["headers"] = {"Authorization": f"Bearer {response.json()['session_token']}"}
+
+    rng = random.Random(0)
+    for _ in range(args.seed_bookings):
+        response = await http.post("/api/bookings/create", json=booking_payload(rng, state["hotel_ids"]), headers=state["headers"])
+        if response.status_code != 200:
+            continue
+        checkout = await http.post(
+            "/api/payments/checkout/session",
+            json={"booking_id": response.json()["booking_id"], "origin_url": "http://localhost:3000"},
+            headers=state["headers"],
+        )
+        if checkout.status_code == 200:
+            state["sessions"].append(checkout.json()["session_id"])
+    return state
+
+
+def request_for(kind: str, rng: random.Random, state: Dict, args):
+    """(method, path, json body) for one request of the given kind"""
+    if kind == "search":
+        destination = rng.choice(MOCK_DESTINATIONS if args.mock_catalog else CITIES)
+        body = {"destination": destination, "check_in": "2027-03-10", "check_out": "2027-03-12", "limit": 20}
+        if rng.random() < 0.3:
+            body.update(sort_by="price", min_rating=rng.choice([None, 7.0, 8.5]))
+        return "POST", "/api/hotels/search", body
+    if kind == "details":
+        hotel_id = rng.randrange(1001, 1146) if args.mock_catalog else rng.randrange(1, 500)
+        return "GET", f"/api/hotels/{hotel_id}", None
+    if kind == "bookings":
+        return "GET", "/api/bookings?limit=20", None
+    if kind == "create_booking":
+        return "POST", "/api/bookings/create", booking_payload(rng, state["hotel_ids"])
+    session_id = rng.choice(state["sessions"]) if state["sessions"] else "missing"
+    return "GET", f"/api/payments/checkout/status/{session_id}", None
+
+
+async def drive(http: httpx.AsyncClient, state: Dict, args) -> Dict:
+    kinds = [kind for kind, weight in MIX.items() for _ in range(weight)]
+    if not state["headers"]:
+        kinds = [kind for kind in kinds if kind != "bookings"]
+    rng = random.Random(args.seed)
+    plan = []
+    for _ in range(args.requests):
+        kind = rng.choice(kinds)
+        plan.append(request_for(kind, rng, state, args) + (kind,))
+
+    latencies: Dict[str, List[float]] = {kind: [] for kind in MIX}
+    errors: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(method: str, path: str, body, kind: str):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await http.request(method, path, json=body, headers=state["headers"])
+            latencies[kind].append(time.perf_counter() - started)
+            if response.status_code >= 500 or response.status_code in (401, 422):
+                errors[f"{kind} {response.status_code}"] = errors.get(f"{kind} {response.status_code}", 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in plan))
+    elapsed = time.perf_counter() - started
+
+    results = {kind: summarize(samples, elapsed) for kind, samples in latencies.items() if samples}
+    results["total"] = summarize([s for samples in latencies.values() for s in samples], elapsed)
+    results["process"] = rss_mb()
+    if errors:
+        print("errors:", errors)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--seed-bookings", type=int, default=50)
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0)
+    parser.add_argument("--mock-catalog", action="store_true", help="serve the mock catalog instead of the stubbed Booking.com API")
+    parser.add_argument("--mongo-url", help="use this mongod instead of mongomock (its loadtest database is dropped first)")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--session-token", help="Bearer token for /api/bookings when driving --url")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    http = httpx.AsyncClient(base_url=args.url, timeout=60.0) if args.url else await setup_app(args)
+    async with http:
+        state = await prepare(http, args)
+        results = await drive(http, state, args)
+
+    print(f"{'endpoint':<16} {'requests':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in results.items():
+        if "p50_ms" in row:
+            print(f"{name:<16} {row['requests']:>8} {row['throughput']:>9.1f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+    print("process:", results["process"])
+    section = "loadtest" + ("_mock" if args.mock_catalog else "") + ("_remote" if args.url else "")
+    finish(section, results, args, calibration)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""Shared helpers for the load test and micro-benchmarks: percentiles, RSS and baseline comparison.
+
+Timings are compared relative to a fixed calibration workload timed in the
+same run, so a baseline recorded on a faster or slower machine still applies.
+"""
+import json
+import random
+import resource
+import sys
+import timeit
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Metrics where a larger number is better; everything else regresses upwards
+HIGHER_IS_BETTER = ("throughput",)
+# Metrics that scale with machine speed, and are adjusted by the calibration ratio
+TIMED = ("throughput", "p50_ms", "p95_ms", "p99_ms")
+# Recorded for reading only; micro cases are compared by their `relative` time
+UNCOMPARED = ("requests", "us_per_op")
+# A percentile is only compared with this many samples beyond it, and latency changes below MIN_CHANGE_MS are jitter
+PERCENTILES = {"p50_ms": 0.50, "p95_ms": 0.95, "p99_ms": 0.99}
+MIN_TAIL_SAMPLES = 10
+MIN_CHANGE_MS = 1.0
+
+
+def _calibration_workload(data=tuple(random.Random(0).sample(range(100000), 2000))):
+    ranked = sorted(data)
+    index = {value: i for i, value in enumerate(ranked)}
+    text = ",".join(str(value) for value in ranked[:500])
+    return sum(index[value] for value in data[:500]) + len(json.dumps({"text": text, "values": ranked[:200]}))
+
+
+def calibrate(repeat: int = 15) -> float:
+    """Microseconds for the calibration workload, best of `repeat`"""
+    timer = timeit.Timer(_calibration_workload)
+    number, _ = timer.autorange()
+    return round(min(timer.repeat(repeat=repeat, number=number)) / number * 1e6, 3)
+
+
+def time_relative(fn, repeat: int, min_time: float = 0.2) -> Dict[str, float]:
+    """Best time per call of `fn`, and as a fraction of the calibration workload.
+
+    Runs of `fn` alternate with calibration runs, so a machine that slows down
+    partway through (other tenants, frequency scaling) slows both alike.
+    """
+    timer, calibration = timeit.Timer(fn), timeit.Timer(_calibration_workload)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    calibration_number, _ = calibration.autorange()
+    best = best_calibration = float("inf")
+    for _ in range(repeat):
+        best = min(best, timer.timeit(number) / number)
+        best_calibration = min(best_calibration, calibration.timeit(calibration_number) / calibration_number)
+    return {"us_per_op": round(best * 1e6, 3), "relative": round(best / best_calibration, 6)}
+
+
+def summarize(latencies: Sequence[float], elapsed: float) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"requests": 0}
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+    return {
+        "requests": len(ordered),
+        "throughput": round(len(ordered) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def rss_mb() -> Dict[str, float]:
+    """Current and peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    current_mb = None
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                current_mb = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return {"rss_mb": round(current_mb, 1) if current_mb else None, "peak_rss_mb": round(peak_mb, 1)}
+
+
+def load_baseline(path: Path = BASELINE) -> Dict:
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_baseline(section: str, results: Dict, path: Path = BASELINE) -> None:
+    baseline = load_baseline(path)
+    baseline[section] = results
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+    print(f"saved {section} baseline to {path}")
+
+
+def compare(section: str, results: Dict, tolerance: float, path: Path = BASELINE) -> Optional[List[str]]:
+    """Metrics in `results` worse than the stored baseline by more than `tolerance` (a fraction); None without a baseline"""
+    baseline = load_baseline(path).get(section)
+    if not baseline:
+        return None
+    # >1 when this machine runs the calibration slower than the one that saved the baseline
+    scale = 1.0
+    if baseline.get("calibration", {}).get("us") and results.get("calibration", {}).get("us"):
+        scale = results["calibration"]["us"] / baseline["calibration"]["us"]
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if name == "calibration" or not isinstance(metrics, dict) or not isinstance(expected, dict):
+            continue
+        for metric, value in metrics.items():
+            before = expected.get(metric)
+            if metric in UNCOMPARED or value is None or not before:
+                continue
+            if metric in PERCENTILES and metrics.get("requests", 0) * (1 - PERCENTILES[metric]) < MIN_TAIL_SAMPLES:
+                continue
+            if metric in TIMED:
+                before = round(before / scale if metric in HIGHER_IS_BETTER else before * scale, 3)
+            if metric in PERCENTILES and abs(value - before) < MIN_CHANGE_MS:
+                continue
+            change = (value - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(f"{name}.{metric}: {before} -> {value} ({change:+.0%})")
+    return regressions
+
+
+def finish(section: str, results: Dict, args, calibration: Optional[float] = None) -> None:
+    """Save or check against the baseline as requested on the command line; exits 1 on regression.
+
+    The calibration is timed again here and the faster of it and `calibration`
+    (from before the run, for long runs) is kept.
+    """
+    results["calibration"] = {"us": min(calibrate(), calibration or float("inf"))}
+    print("calibration:", results["calibration"])
+    if args.save_baseline:
+        save_baseline(section, results)
+        return
+    regressions = compare(section, results, args.tolerance)
+    if regressions is None:
+        print(f"no {section} baseline in {BASELINE}; run with --save-baseline to record one")
+        return
+    if regressions:
+        print(f"REGRESSIONS against baseline (tolerance {args.tolerance:.0%}):")
+        for regression in regressions:
+            print("  " + regression)
+        sys.exit(1)
+    print(f"no regressions against the {section} baseline (tolerance {args.tolerance:.0%})")
+
+
+def add_baseline_arguments(parser) -> None:
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a metric counts as a regression")
@@ -0,0 +1,101 @@
+"""Fake Stripe webhook sender: fires a burst of signed checkout events at the webhook endpoint.
+
+Events reference the checkout session ids found in payment_transactions (or
+made-up ones with --fake-sessions) and a share of them are sent twice, the way
+Stripe redelivers. Reports request latency, then the pipeline counters from
+/api/status once the queue has drained.
+
+The server must run with the same STRIPE_WEBHOOK_SECRET; it ignores events otherwise.
+
+Usage: STRIPE_WEBHOOK_SECRET=whsec_test python benchmarks/send_stripe_webhooks.py \\
+           [--url http://localhost:8001] [--events 5000] [--duplicates 0.1] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from webhooks import signature_header  # noqa: E402
+
+EVENT_TYPES = ("checkout.session.completed", "checkout.session.completed", "checkout.session.expired")
+
+
+async def session_ids(count: int, fake: bool):
+    if fake:
+        return [f"mock_session_{uuid.uuid4().hex}" for _ in range(count)]
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    try:
+        db = client[os.environ.get("DB_NAME", "test_database")]
+        return [doc["session_id"] async for doc in db.payment_transactions.find({}, {"_id": 0, "session_id": 1}).limit(count)]
+    finally:
+        client.close()
+
+
+def make_event(session_id: str) -> dict:
+    return {
+        "id": f"evt_{uuid.uuid4().hex}",
+        "type": random.choice(EVENT_TYPES),
+        "created": int(time.time()),
+        "data": {"object": {"id": session_id, "object": "checkout.session", "payment_status": "paid"}},
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--fake-sessions", action="store_true")
+    args = parser.parse_args()
+
+    secret = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
+    sessions = await session_ids(args.events, args.fake_sessions) or await session_ids(args.events, True)
+    events = [make_event(sessions[i % len(sessions)]) for i in range(args.events)]
+    deliveries = events + random.sample(events, int(len(events) * args.duplicates))
+    random.shuffle(deliveries)
+
+    latencies, statuses = [], {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0) as http:
+        async def deliver(event: dict):
+            payload = json.dumps(event).encode()
+            headers = {"Content-Type": "application/json"}
+            if secret:
+                headers["Stripe-Signature"] = signature_header(payload, secret)
+            async with semaphore:
+                started = time.perf_counter()
+                response = await http.post("/api/webhook/stripe", content=payload, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(deliver(event) for event in deliveries))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        print(f"{len(deliveries)} deliveries ({len(deliveries) - len(events)} duplicates) in {elapsed:.2f}s: {len(deliveries) / elapsed:.0f}/s")
+        print(f"p50={statistics.median(latencies) * 1000:.2f}ms  p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms  statuses={statuses}")
+
+        for _ in range(100):
+            pipeline = (await http.get("/api/status")).json()["stripe_webhooks"]
+            if pipeline["queued"] == 0:
+                break
+            await asyncio.sleep(0.1)
+        print("pipeline:", pipeline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
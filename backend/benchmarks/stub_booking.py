@@ -0,0 +1,144 @@
+"""Local stand-in for the Booking.com demand API and the OAuth session service.
+
+Run standalone:  python benchmarks/stub_booking.py --port 8765 [--latency-ms 20] [--error-rate 0.2]
+or start it in-process from a benchmark with `run_in_thread()`.
+
+Booking.com routes can inject faults: a share of requests answer 503
+(`error_rate`) or stall for `hang_ms` before answering (`hang_rate`), and
+`down` fails every request. Change them at runtime through `settings` or
+POST /_faults with a JSON body of the fields to set. `settings.calls` counts
+the Booking.com requests received.
+"""
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class StubSettings:
+    latency_ms: float = 0.0
+    results: int = 15
+    error_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_ms: float = 30000.0
+    down: bool = False
+    calls: int = 0
+
+
+settings = StubSettings()
+
+
+def accommodation(accommodation_id: int, city: str = "") -> dict:
+    return {
+        "id": accommodation_id,
+        "name": f"Stub Hotel {accommodation_id}",
+        "city": city,
+        "country": "us",
+        "description": "Stub accommodation served by the local benchmark server",
+        "price": {"total": 100 + accommodation_id % 400},
+        "currency": {"accommodation": "USD"},
+        "review_score": 7 + accommodation_id % 30 / 10,
+        "review_count": accommodation_id % 5000,
+        "image_urls": [f"https://example.invalid/{accommodation_id}.jpg"],
+        "facilities": ["Free WiFi", "Pool"],
+    }
+
+
+FAULT_FIELDS = ("latency_ms", "error_rate", "hang_rate", "hang_ms", "down")
+
+
+async def _delay():
+    if settings.latency_ms:
+        await asyncio.sleep(settings.latency_ms / 1000)
+
+
+async def _fault():
+    """A 503 response to send instead of the real one, if a fault is injected"""
+    settings.calls += 1
+    if settings.hang_rate and random.random() < settings.hang_rate:
+        await asyncio.sleep(settings.hang_ms / 1000)
+    if settings.down or (settings.error_rate and random.random() < settings.error_rate):
+        return JSONResponse({"errors": [{"message": "injected fault"}]}, status_code=503)
+    return None
+
+
+async def search(request: Request):
+    await _delay()
+    fault = await _fault()
+    if fault is not None:
+        return fault
+    body = await request.json()
+    city = body.get("city", 0)
+    return JSONResponse({"data": [accommodation(abs(city) % 100000 + i) for i in range(settings.results)]})
+
+
+async def details(request: Request):
+    await _delay()
+    fault = await _fault()
+    if fault is not None:
+        return fault
+    return JSONResponse({"data": accommodation(int(request.path_params["accommodation_id"]))})
+
+
+async def session_data(request: Request):
+    await _delay()
+    session_id = request.headers.get("X-Session-ID", "anonymous")
+    return JSONResponse({
+        "id": f"user_{session_id}",
+        "email": f"{session_id}@example.com",
+        "name": "Stub User",
+        "picture": "",
+        "session_token": f"token_{session_id}",
+    })
+
+
+async def faults(request: Request):
+    for field, value in (await request.json()).items():
+        if field in FAULT_FIELDS:
+            setattr(settings, field, type(getattr(settings, field))(value))
+    return JSONResponse({field: getattr(settings, field) for field in FAULT_FIELDS})
+
+
+app = Starlette(routes=[
+    Route("/accommodations/search", search, methods=["POST"]),
+    Route("/_faults", faults, methods=["POST"]),
+    Route("/accommodations/{accommodation_id:int}", details),
+    Route("/auth/v1/env/oauth/session-data", session_data),
+])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_in_thread(port: int = 0) -> str:
+    """Start the stub on a background thread; returns its base URL"""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of Booking.com requests answered with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of Booking.com requests stalled for --hang-ms")
+    parser.add_argument("--hang-ms", type=float, default=30000.0)
+    args = parser.parse_args()
+    settings.latency_ms = args.latency_ms
+    settings.error_rate, settings.hang_rate, settings.hang_ms = args.error_rate, args.hang_rate, args.hang_ms
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
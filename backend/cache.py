@@ -0,0 +1,220 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple, Union
+
+Deadline = Union[datetime, float]
+
+
+def to_timestamp(expires_at: Deadline) -> float:
+    """Epoch seconds for a deadline; naive datetimes (as Mongo returns them) are UTC"""
+    if isinstance(expires_at, datetime):
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at.timestamp()
+    return float(expires_at)
+
+
+def is_fresh(doc: Dict[str, Any]) -> bool:
+    """Whether a cache document is still before its `expires_at`"""
+    return to_timestamp(doc["expires_at"]) > time.time()
+
+
+class TTLCache:
+    """Size-bounded in-process LRU whose entries expire at their own deadline.
+
+    Deadlines are wall-clock, so an entry copied from a Mongo cache document
+    stops being served at that document's `expires_at`, exactly when the
+    `{"expires_at": {"$gt": now}}` query would stop matching it.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        deadline, value = entry
+        if deadline <= time.time():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Deadline) -> None:
+        deadline = to_timestamp(expires_at)
+        if deadline <= time.time() or self.maxsize <= 0:
+            return
+        self._entries[key] = (deadline, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TieredCache:
+    """In-process TTLCache in front of a Mongo cache collection.
+
+    Lookups try memory first and only fall through to the collection on a miss;
+    documents found or written there are kept in memory until their own
+    `expires_at`, so hot keys skip the database round-trip entirely.
+
+    With a `stale_grace`, `lookup` and `find_many` also return documents up to
+    that many seconds past `expires_at` (check them with `is_fresh`), so callers
+    can serve a stale result while they refresh it. The collection's TTL index
+    must keep documents at least that long.
+    """
+
+    def __init__(self, maxsize: int = 1024, stale_grace: float = 0.0):
+        self.memory = TTLCache(maxsize)
+        self.stale_grace = stale_grace
+        self.db_hits = 0
+        self.db_misses = 0
+        self.stale_hits = 0
+
+    def _remember(self, key: Hashable, doc: Dict[str, Any]) -> None:
+        self.memory.set(key, doc, to_timestamp(doc["expires_at"]) + self.stale_grace)
+
+    def _oldest_usable(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=self.stale_grace)
+
+    async def lookup(self, collection, key: Hashable, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Newest document for `key` that is fresh or within `stale_grace` of expiry"""
+        doc = self.memory.get(key)
+        if doc is None:
+            doc = await collection.find_one(
+                {**query, "expires_at": {"$gt": self._oldest_usable()}}, {"_id": 0}, sort=[("expires_at", -1)]
+            )
+            if doc is None:
+                self.db_misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, doc)
+        if not is_fresh(doc):
+            self.stale_hits += 1
+        return doc
+
+    async def find_one(self, collection, key: Hashable, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        doc = await self.lookup(collection, key, query)
+        return doc if doc is not None and is_fresh(doc) else None
+
+    async def expires_at(self, collection, query: Dict[str, Any]) -> Optional[float]:
+        """Expiry (epoch seconds) of the newest stored document matching `query`, read from the collection
+        so entries refreshed by other workers count; not recorded in the hit statistics"""
+        doc = await collection.find_one(query, {"_id": 0, "expires_at": 1}, sort=[("expires_at", -1)])
+        return None if doc is None else to_timestamp(doc["expires_at"])
+
+    async def insert_one(self, collection, key: Hashable, doc: Dict[str, Any]) -> None:
+        await collection.insert_one(dict(doc))
+        self._remember(key, doc)
+
+    async def find_many(self, collection, field: str, keys: Iterable[Hashable]) -> Dict[Hashable, Dict[str, Any]]:
+        """Usable documents whose `field` is one of `keys`, keyed by it; one $in query for the memory misses"""
+        found: Dict[Hashable, Dict[str, Any]] = {}
+        misses = []
+        for key in keys:
+            doc = self.memory.get(key)
+            if doc is None:
+                misses.append(key)
+            else:
+                found[key] = doc
+        if misses:
+            query = {field: {"$in": misses}, "expires_at": {"$gt": self._oldest_usable()}}
+            async for doc in collection.find(query, {"_id": 0}):
+                key = doc[field]
+                if key not in found or to_timestamp(doc["expires_at"]) > to_timestamp(found[key]["expires_at"]):
+                    found[key] = doc
+            for key in misses:
+                if key in found:
+                    self.db_hits += 1
+                    self._remember(key, found[key])
+                else:
+                    self.db_misses += 1
+        self.stale_hits += sum(1 for doc in found.values() if not is_fresh(doc))
+        return found
+
+    async def insert_many(self, collection, docs: Dict[Hashable, Dict[str, Any]]) -> None:
+        if not docs:
+            return
+        await collection.insert_many([dict(doc) for doc in docs.values()])
+        for key, doc in docs.items():
+            self._remember(key, doc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"memory": self.memory.stats(), "db_hits": self.db_hits, "db_misses": self.db_misses, "stale_hits": self.stale_hits}
+
+
+class SessionCache:
+    """Resolved session token -> user document, for get_current_user.
+
+    Entries live for at most `ttl` seconds and never past the session's own
+    expiry. A reverse user_id index lets profile updates drop every cached
+    session belonging to that user.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize)
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+
+    def get(self, session_token: str) -> Optional[Dict[str, Any]]:
+        return self.memory.get(session_token)
+
+    def set(self, session_token: str, user_doc: Dict[str, Any], session_expires_at: Deadline) -> None:
+        deadline = min(time.time() + self.ttl, to_timestamp(session_expires_at))
+        self.memory.set(session_token, user_doc, deadline)
+        self._tokens_by_user.setdefault(user_doc["user_id"], set()).add(session_token)
+        if len(self._tokens_by_user) > 2 * self.memory.maxsize:
+            self._prune()
+
+    def _prune(self) -> None:
+        live = self.memory._entries
+        self._tokens_by_user = {
+            user_id: {token for token in tokens if token in live}
+            for user_id, tokens in self._tokens_by_user.items()
+            if any(token in live for token in tokens)
+        }
+
+    def invalidate(self, session_token: str) -> None:
+        user_doc = self.memory.pop(session_token)
+        if user_doc is not None:
+            self._tokens_by_user.get(user_doc["user_id"], set()).discard(session_token)
+
+    def invalidate_user(self, user_id: str) -> None:
+        for session_token in self._tokens_by_user.pop(user_id, ()):
+            self.memory.pop(session_token)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.memory.stats()
@@ -0,0 +1,426 @@
+import hashlib
+import json
+import logging
+import re
+import sys
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+DESTINATION_FIELDS = ("city", "country")
+INDEXED_FIELDS = ("city", "country", "name")
+SORT_FIELDS = ("price", "rating", "review_count")
+SEEDED_ORDER_CACHE_SIZE = 128
+HOTEL_FIELDS = ("id", "name", "city", "country", "description", "price", "currency", "rating", "review_count", "image_urls", "amenities")
+
+
+class HotelRecord:
+    """Compact, read-only catalog row.
+
+    Uses __slots__ instead of a per-row dict and supports the mapping protocol
+    (`hotel["name"]`, `hotel.get(...)`, `HotelInfo(**hotel)`), so it drops in
+    wherever catalog dicts were used. Build rows through an Interner so repeated
+    strings and image/amenity lists are shared across the catalog.
+    """
+
+    __slots__ = HOTEL_FIELDS
+
+    def __init__(self, **fields):
+        for field in HOTEL_FIELDS:
+            object.__setattr__(self, field, fields[field])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HotelRecord is read-only")
+
+    def __getitem__(self, field: str):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __contains__(self, field: str) -> bool:
+        return field in HOTEL_FIELDS
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, HotelRecord):
+            other = other.to_dict()
+        return isinstance(other, Mapping) and self.to_dict() == dict(other)
+
+    def __repr__(self) -> str:
+        return f"HotelRecord(id={self.id!r}, name={self.name!r})"
+
+    def get(self, field: str, default=None):
+        return getattr(self, field, default) if field in HOTEL_FIELDS else default
+
+    def keys(self):
+        return HOTEL_FIELDS
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in HOTEL_FIELDS}
+
+
+class Interner:
+    """Shares equal strings and string lists between catalog rows"""
+
+    def __init__(self):
+        self._lists: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def string(self, value: str) -> str:
+        return sys.intern(value)
+
+    def strings(self, values: Iterable[str]) -> Tuple[str, ...]:
+        key = tuple(sys.intern(v) for v in values)
+        return self._lists.setdefault(key, key)
+
+    def record(self, hotel: Mapping) -> HotelRecord:
+        if isinstance(hotel, HotelRecord):
+            hotel = hotel.to_dict()
+        return HotelRecord(
+            id=hotel["id"],
+            name=self.string(hotel["name"]),
+            city=self.string(hotel["city"]),
+            country=self.string(hotel["country"]),
+            description=self.string(hotel["description"]),
+            price=float(hotel["price"]),
+            currency=self.string(hotel["currency"]),
+            rating=float(hotel["rating"]),
+            review_count=hotel["review_count"],
+            image_urls=self.strings(hotel["image_urls"]),
+            amenities=self.strings(hotel["amenities"]),
+        )
+
+
+def catalog_version(hotels: Sequence[Mapping]) -> str:
+    """Content fingerprint of a catalog load, used to key caches and ETags"""
+    rows = [h.to_dict() if isinstance(h, HotelRecord) else h for h in hotels]
+    digest = hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+def recommended_scores(hotels: Sequence[Mapping]) -> List[float]:
+    """Bayesian-average rating: thinly reviewed hotels are pulled toward the catalog mean"""
+    if not hotels:
+        return []
+    mean_rating = sum(h["rating"] for h in hotels) / len(hotels)
+    prior_reviews = sum(h["review_count"] for h in hotels) / len(hotels)
+    return [
+        (h["rating"] * h["review_count"] + mean_rating * prior_reviews) / (h["review_count"] + prior_reviews or 1)
+        for h in hotels
+    ]
+
+
+class HotelSearchIndex:
+    """Inverted index over catalog text fields, built once per catalog load.
+
+    Substring lookups go through n-gram postings over the *distinct* lowercased
+    field values (a few dozen cities, not tens of thousands of hotels), so a query
+    costs roughly the number of matching hotels. Token prefix postings back
+    prefix lookups such as destination autocomplete.
+    """
+
+    NGRAM = 3
+
+    def __init__(self, hotels: Sequence[Mapping], fields: Iterable[str] = INDEXED_FIELDS):
+        self.size = len(hotels)
+        self.fields = tuple(fields)
+        self._postings: Dict[str, Dict[str, List[int]]] = {f: {} for f in self.fields}
+        self._grams: Dict[str, Dict[str, Set[str]]] = {f: {} for f in self.fields}
+        self._token_postings: Dict[str, Dict[str, List[int]]] = {f: {} for f in self.fields}
+        self._tokens: Dict[str, List[str]] = {}
+
+        for position, hotel in enumerate(hotels):
+            for field in self.fields:
+                value = str(hotel.get(field, "")).lower()
+                self._postings[field].setdefault(value, []).append(position)
+                for token in set(TOKEN_RE.findall(value)):
+                    self._token_postings[field].setdefault(token, []).append(position)
+
+        for field in self.fields:
+            grams = self._grams[field]
+            for value in self._postings[field]:
+                for gram in self._ngrams(value):
+                    grams.setdefault(gram, set()).add(value)
+            self._tokens[field] = sorted(self._token_postings[field])
+
+    def _ngrams(self, value: str) -> Set[str]:
+        """Every substring of length 1..NGRAM, so short queries resolve exactly"""
+        return {
+            value[start:start + n]
+            for n in range(1, self.NGRAM + 1)
+            for start in range(len(value) - n + 1)
+        }
+
+    def _matching_values(self, field: str, query: str) -> Iterable[str]:
+        grams = self._grams[field]
+        if len(query) <= self.NGRAM:
+            return grams.get(query, ())
+
+        candidates = None
+        for start in range(len(query) - self.NGRAM + 1):
+            values = grams.get(query[start:start + self.NGRAM])
+            if not values:
+                return ()
+            candidates = set(values) if candidates is None else candidates & values
+            if not candidates:
+                return ()
+        return [value for value in candidates if query in value]
+
+    def search(self, query: str, fields: Iterable[str] = DESTINATION_FIELDS) -> List[int]:
+        """Catalog positions whose field contains `query` (case-insensitive), in catalog order"""
+        query = query.lower()
+        if not query:
+            return list(range(self.size))
+
+        positions: Set[int] = set()
+        for field in fields:
+            postings = self._postings[field]
+            for value in self._matching_values(field, query):
+                positions.update(postings[value])
+        return sorted(positions)
+
+    def prefix(self, prefix: str, fields: Iterable[str] = INDEXED_FIELDS) -> List[int]:
+        """Catalog positions with a token in `fields` starting with `prefix`, in catalog order"""
+        prefix = prefix.lower()
+        positions: Set[int] = set()
+        for field in fields:
+            tokens = self._tokens[field]
+            postings = self._token_postings[field]
+            i = bisect_left(tokens, prefix)
+            while i < len(tokens) and tokens[i].startswith(prefix):
+                positions.update(postings[tokens[i]])
+                i += 1
+        return sorted(positions)
+
+
+def _order_and_rank(keys: Sequence) -> Tuple[List[int], List[int]]:
+    order = sorted(range(len(keys)), key=lambda i: (keys[i], i))
+    rank = [0] * len(keys)
+    for r, position in enumerate(order):
+        rank[position] = r
+    return order, rank
+
+
+class CatalogViews:
+    """Precomputed sorted views and amenity postings used to page through results.
+
+    Each sortable field keeps catalog positions ordered by (value, position) plus
+    the parallel key list for bisecting range filters, so a page over the whole
+    catalog costs O(log n + offset + limit) instead of sorting on every request.
+    Rankings ("recommended") are ascending views over a derived key, and seeded
+    shuffles are memoised per seed, so ordering never mutates the catalog and is
+    reproducible for a given catalog version.
+    """
+
+    def __init__(self, hotels: Sequence[Mapping], version: Optional[str] = None):
+        self.hotels = hotels
+        self.size = len(hotels)
+        self.version = version or catalog_version(hotels)
+        self.order: Dict[str, List[int]] = {}
+        self.keys: Dict[str, List[float]] = {}
+        self.rank: Dict[str, List[int]] = {}
+        columns = {field: [h[field] for h in hotels] for field in SORT_FIELDS}
+        columns["recommended"] = [-score for score in recommended_scores(hotels)]
+        for field, column in columns.items():
+            order, rank = _order_and_rank(column)
+            self.order[field] = order
+            self.keys[field] = [column[i] for i in order]
+            self.rank[field] = rank
+        self._seeded: "OrderedDict[str, Tuple[List[int], List[int]]]" = OrderedDict()
+
+        self.amenities: Dict[str, Set[int]] = {}
+        for position, hotel in enumerate(hotels):
+            for amenity in hotel.get("amenities", ()):
+                self.amenities.setdefault(amenity.lower(), set()).add(position)
+
+    def _predicate(self, ranges: Dict[str, Tuple[Optional[float], Optional[float]]], amenities: Sequence[str], exclude: Collection[int] = ()):
+        required = [self.amenities.get(a.lower(), set()) for a in amenities]
+        bounds = [(field, low, high) for field, (low, high) in ranges.items() if low is not None or high is not None]
+        hotels = self.hotels
+
+        def matches(position: int) -> bool:
+            if position in exclude:
+                return False
+            for postings in required:
+                if position not in postings:
+                    return False
+            for field, low, high in bounds:
+                value = hotels[position][field]
+                if (low is not None and value < low) or (high is not None and value > high):
+                    return False
+            return True
+
+        return matches
+
+    def seeded(self, seed: str) -> Tuple[List[int], List[int]]:
+        """Pseudo-random (order, rank) that is stable for a seed and catalog version"""
+        if seed in self._seeded:
+            self._seeded.move_to_end(seed)
+            return self._seeded[seed]
+        prefix = f"{seed}:".encode()
+        keys = [hashlib.blake2b(prefix + str(h["id"]).encode(), digest_size=8).digest() for h in self.hotels]
+        self._seeded[seed] = _order_and_rank(keys)
+        if len(self._seeded) > SEEDED_ORDER_CACHE_SIZE:
+            self._seeded.popitem(last=False)
+        return self._seeded[seed]
+
+    def _walk(self, sort_by: str, order: List[int], descending: bool, ranges: Dict) -> Tuple[Iterator[int], Dict]:
+        """Iterate a sorted view, bisecting away the range filter on the sort field itself"""
+        low, high = ranges.get(sort_by, (None, None))
+        lo, hi = 0, self.size
+        if sort_by in self.keys:
+            keys = self.keys[sort_by]
+            lo = 0 if low is None else bisect_left(keys, low)
+            hi = self.size if high is None else bisect_right(keys, high)
+        walk = (order[i] for i in (range(hi - 1, lo - 1, -1) if descending else range(lo, hi)))
+        return walk, {field: bound for field, bound in ranges.items() if field != sort_by}
+
+    def iterate(
+        self,
+        candidates: Optional[Sequence[int]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        amenities: Sequence[str] = (),
+        seed: Optional[str] = None,
+        exclude: Collection[int] = (),
+    ) -> Iterator[int]:
+        """Lazily filter and sort catalog positions, yielding each match as it is found
+
+        `candidates` are positions in catalog order (e.g. from HotelSearchIndex);
+        None means the whole catalog, which is served straight off the sorted views.
+        Without `sort_by`, a `seed` selects a seeded shuffle instead of catalog order.
+        Positions in `exclude` (e.g. sold-out hotels) never match.
+        """
+        ranges = ranges or {}
+        order = rank = None
+        if sort_by:
+            order, rank = self.order[sort_by], self.rank[sort_by]
+        elif seed is not None:
+            order, rank = self.seeded(seed)
+
+        if candidates is None and order is not None:
+            walk, ranges = self._walk(sort_by, order, descending, ranges)
+        else:
+            walk = iter(range(self.size) if candidates is None else candidates)
+        matches = self._predicate(ranges, amenities, exclude)
+        walk = (position for position in walk if matches(position))
+
+        if candidates is not None and rank is not None:
+            walk = iter(sorted(walk, key=rank.__getitem__, reverse=descending))
+        return walk
+
+    def select(
+        self,
+        candidates: Optional[Sequence[int]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        amenities: Sequence[str] = (),
+        offset: int = 0,
+        limit: Optional[int] = None,
+        seed: Optional[str] = None,
+        exclude: Collection[int] = (),
+    ) -> Tuple[List[int], Optional[int]]:
+        """Filter, sort and page catalog positions; returns (page, next_offset or None)"""
+        walk = self.iterate(candidates, sort_by, descending, ranges, amenities, seed, exclude)
+        stop = None if limit is None else offset + limit + 1
+        page = list(islice(walk, offset, stop))
+        if limit is not None and len(page) > limit:
+            return page[:limit], offset + limit
+        return page, None
+
+
+class SerializedCatalog:
+    """Catalog validated once at load time, with each hotel pre-encoded as JSON bytes.
+
+    Result sets are assembled by joining the per-hotel payloads, and the most
+    requested ones are kept whole in a bounded LRU. An instance belongs to one
+    catalog version; reloading the catalog replaces it, which drops every entry.
+    """
+
+    def __init__(self, hotels: Sequence[Mapping], encode: Callable[[Mapping], bytes], version: Optional[str] = None, result_cache_size: int = 256):
+        self.version = version or catalog_version(hotels)
+        self.payloads: List[bytes] = [encode(hotel) for hotel in hotels]
+        self.result_cache_size = result_cache_size
+        self._results: "OrderedDict[str, Tuple[bytes, Optional[int]]]" = OrderedDict()
+
+    def hotel(self, position: int) -> bytes:
+        return self.payloads[position]
+
+    def array(self, positions: Iterable[int]) -> bytes:
+        payloads = self.payloads
+        return b"[" + b",".join(payloads[i] for i in positions) + b"]"
+
+    def result_set(self, key: str, select: Callable[[], Tuple[List[int], Optional[int]]]) -> Tuple[bytes, Optional[int]]:
+        """Encoded JSON array and next offset for `key`, running `select()` on a miss"""
+        cached = self._results.get(key)
+        if cached is not None:
+            self._results.move_to_end(key)
+            return cached
+        positions, next_offset = select()
+        cached = self._results[key] = (self.array(positions), next_offset)
+        if len(self._results) > self.result_cache_size:
+            self._results.popitem(last=False)
+        return cached
+
+
+class DuplicateHotelIdError(ValueError):
+    pass
+
+
+class HotelCatalog:
+    """Repository for one loaded version of the hotel catalog.
+
+    Owns the id -> position map used for O(1) lookups along with the search
+    index, sorted views and (optionally) pre-encoded payloads derived from the
+    same rows, so a reload swaps all of them at once. Duplicate ids are detected
+    at load time; the first occurrence wins unless `strict` is set. Rows are
+    stored as interned HotelRecords unless `compact` is disabled.
+    """
+
+    def __init__(self, hotels: Iterable[Mapping], encode: Optional[Callable[[Mapping], bytes]] = None, strict: bool = False, compact: bool = True):
+        self.hotels: List[Mapping] = []
+        self.positions: Dict[int, int] = {}
+        self.duplicates: List[int] = []
+        interner = Interner() if compact else None
+        for hotel in hotels:
+            if hotel["id"] in self.positions:
+                self.duplicates.append(hotel["id"])
+                continue
+            self.positions[hotel["id"]] = len(self.hotels)
+            self.hotels.append(interner.record(hotel) if interner else hotel)
+
+        if self.duplicates:
+            if strict:
+                raise DuplicateHotelIdError(f"Duplicate hotel ids in catalog: {sorted(set(self.duplicates))}")
+            logger.warning(f"Ignoring {len(self.duplicates)} catalog rows with duplicate hotel ids: {sorted(set(self.duplicates))[:20]}")
+
+        self.version = catalog_version(self.hotels)
+        self.index = HotelSearchIndex(self.hotels)
+        self.views = CatalogViews(self.hotels, self.version)
+        self.payloads = SerializedCatalog(self.hotels, encode, self.version) if encode else None
+
+    def __len__(self) -> int:
+        return len(self.hotels)
+
+    def __iter__(self) -> Iterator[Mapping]:
+        return iter(self.hotels)
+
+    def __contains__(self, hotel_id: int) -> bool:
+        return hotel_id in self.positions
+
+    def position(self, hotel_id: int) -> Optional[int]:
+        return self.positions.get(hotel_id)
+
+    def get(self, hotel_id: int) -> Optional[Mapping]:
+        position = self.positions.get(hotel_id)
+        return None if position is None else self.hotels[position]
+
+    def get_many(self, hotel_ids: Iterable[int]) -> Dict[int, Mapping]:
+        """Hotels for the ids that exist, keyed by id; unknown ids are omitted"""
+        hotels, positions = self.hotels, self.positions
+        return {hotel_id: hotels[positions[hotel_id]] for hotel_id in hotel_ids if hotel_id in positions}
@@ -0,0 +1,182 @@
+"""Compact binary catalog format, so startup doesn't compile a large Python literal.
+
+The file is a struct-of-arrays: a shared string table (every distinct string is
+stored once), a table of distinct string lists (image_urls / amenities), and one
+fixed-width little-endian column per field holding values or table references.
+The header records the name and SHA-1 of the source file it was built from.
+
+Regenerate it from the Python/text sources with:
+
+    python catalog_store.py build [--source extended_hotels.py] [--output extended_hotels.cat]
+"""
+import argparse
+import ast
+import hashlib
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+MAGIC = b"LXCAT\x00\x02\x00"
+HEADER = struct.Struct("<8s64s20sIIII")
+STRING_FIELDS = ("name", "city", "country", "description", "currency")
+LIST_FIELDS = ("image_urls", "amenities")
+NUMERIC_FIELDS = (("id", "q"), ("price", "d"), ("rating", "d"), ("review_count", "q"))
+FIELD_ORDER = ("id", "name", "city", "country", "description", "price", "currency", "rating", "review_count", "image_urls", "amenities")
+DEFAULT_SOURCE = Path(__file__).parent / "extended_hotels.py"
+DEFAULT_OUTPUT = Path(__file__).parent / "extended_hotels.cat"
+
+
+class CatalogFormatError(ValueError):
+    pass
+
+
+def source_digest(path: Path) -> bytes:
+    return hashlib.sha1(Path(path).read_bytes()).digest()
+
+
+def read_source(path: Path) -> List[Dict]:
+    """Hotels from an EXTENDED_HOTELS-style .py module or a bare list literal (.txt)"""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Expr):
+            return ast.literal_eval(node.value)
+        if isinstance(node, ast.Assign):
+            return ast.literal_eval(node.value)
+    raise CatalogFormatError(f"No hotel list literal found in {path}")
+
+
+def _le(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_le(typecode: str, data: memoryview) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def encode_catalog(hotels: Iterable[Mapping], source: Optional[Path] = None) -> bytes:
+    source_name = Path(source).name.encode("utf-8") if source else b""
+    if len(source_name) > 64:
+        raise CatalogFormatError(f"Source file name {Path(source).name!r} is longer than 64 bytes")
+    digest = source_digest(source) if source else b""
+    strings: Dict[str, int] = {}
+    lists: Dict[Tuple[int, ...], int] = {}
+
+    def string_ref(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    def list_ref(values: Iterable[str]) -> int:
+        return lists.setdefault(tuple(string_ref(v) for v in values), len(lists))
+
+    hotels = list(hotels)
+    columns: List[bytes] = []
+    for field, typecode in NUMERIC_FIELDS:
+        columns.append(_le(array(typecode, (h[field] for h in hotels))))
+    for field in STRING_FIELDS:
+        columns.append(_le(array("I", (string_ref(h[field]) for h in hotels))))
+    for field in LIST_FIELDS:
+        columns.append(_le(array("I", (list_ref(h[field]) for h in hotels))))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = array("I", [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    list_offsets = array("I", [0])
+    list_items = array("I")
+    for items in lists:
+        list_items.extend(items)
+        list_offsets.append(len(list_items))
+
+    header = HEADER.pack(MAGIC, source_name, digest.ljust(20, b"\x00"), len(hotels), len(encoded), len(lists), len(list_items))
+    return b"".join([header, _le(string_offsets), b"".join(encoded), _le(list_offsets), _le(list_items), *columns])
+
+
+def decode_catalog(data: bytes, source_dir: Optional[Path] = None) -> List[Dict]:
+    """Hotels as dicts with interned strings; repeated lists are shared tuples.
+
+    With `source_dir`, the source file named in the header is looked up there
+    and the catalog rejected if that file has changed since it was built.
+    """
+    if len(data) < HEADER.size:
+        raise CatalogFormatError("Catalog file is truncated")
+    magic, source_name, digest, count, n_strings, n_lists, n_items = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CatalogFormatError("Not a catalog file or unsupported format version")
+    source_name = source_name.rstrip(b"\x00").decode("utf-8")
+    if source_dir is not None and source_name:
+        source = Path(source_dir) / source_name
+        if source.exists() and digest != source_digest(source).ljust(20, b"\x00"):
+            raise CatalogFormatError(f"Catalog file is stale relative to its source {source_name}")
+
+    view = memoryview(data)
+    cursor = HEADER.size
+
+    def take(typecode: str, length: int) -> array:
+        nonlocal cursor
+        size = array(typecode).itemsize * length
+        column = _from_le(typecode, view[cursor:cursor + size])
+        cursor += size
+        return column
+
+    string_offsets = take("I", n_strings + 1)
+    blob = bytes(view[cursor:cursor + string_offsets[-1]])
+    cursor += string_offsets[-1]
+    strings = [sys.intern(blob[string_offsets[i]:string_offsets[i + 1]].decode("utf-8")) for i in range(n_strings)]
+    list_offsets = take("I", n_lists + 1)
+    list_items = take("I", n_items)
+    shared_lists = [tuple(strings[j] for j in list_items[list_offsets[i]:list_offsets[i + 1]]) for i in range(n_lists)]
+
+    columns = {field: take(typecode, count) for field, typecode in NUMERIC_FIELDS}
+    for field in STRING_FIELDS:
+        columns[field] = [strings[ref] for ref in take("I", count)]
+    for field in LIST_FIELDS:
+        columns[field] = [shared_lists[ref] for ref in take("I", count)]
+    if cursor != len(data):
+        raise CatalogFormatError("Catalog file has trailing or missing data")
+
+    return [
+        {
+            "id": id_, "name": name, "city": city, "country": country, "description": description,
+            "price": price, "currency": currency, "rating": rating, "review_count": review_count,
+            "image_urls": image_urls, "amenities": amenities,
+        }
+        for id_, name, city, country, description, price, currency, rating, review_count, image_urls, amenities
+        in zip(*(columns[field] for field in FIELD_ORDER))
+    ]
+
+
+def write_catalog(path: Path, hotels: Iterable[Mapping], source: Optional[Path] = None) -> int:
+    data = encode_catalog(hotels, source)
+    Path(path).write_bytes(data)
+    return len(data)
+
+
+def read_catalog(path: Path, check_source: bool = False) -> List[Dict]:
+    """Load a compact catalog; with `check_source`, reject it if the source file it was built from
+    (looked up next to it) has changed since"""
+    return decode_catalog(Path(path).read_bytes(), Path(path).parent if check_source else None)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the compact hotel catalog file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Regenerate the compact catalog from a .py/.txt source")
+    build.add_argument("--source", type=Path, default=DEFAULT_SOURCE)
+    build.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    hotels = read_source(args.source)
+    size = write_catalog(args.output, hotels, args.source)
+    print(f"Wrote {len(hotels)} hotels to {args.output} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Expired Booking.com cache documents are kept this long so they can be served
+# stale while a refresh runs or while the upstream is down
+CACHE_STALE_SECONDS = int(os.environ.get("CACHE_STALE_SECONDS", 24 * 3600))
+
+# Every query server.py issues should be covered by one of these. TTL indexes let
+# Mongo delete expired cache and session documents on its own.
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "user_sessions": [
+        IndexModel([("session_token", ASCENDING)], unique=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "users": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)]),
+        # At most one guest user per email, so concurrent guest bookings can't create duplicates
+        IndexModel([("email", ASCENDING), ("is_guest", ASCENDING)], unique=True, partialFilterExpression={"is_guest": True}),
+    ],
+    "bookings": [
+        IndexModel([("booking_id", ASCENDING)], unique=True),
+        # Booking history: equality on user_id, keyset order on (created_at, booking_id)
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("booking_id", DESCENDING)]),
+    ],
+    "payment_transactions": [
+        IndexModel([("session_id", ASCENDING)], unique=True),
+    ],
+    "room_inventory": [
+        IndexModel([("hotel_id", ASCENDING), ("night", ASCENDING)], unique=True),
+        # RoomInventory.load: sold-out nights from today on
+        IndexModel([("night", ASCENDING), ("booked", ASCENDING)]),
+    ],
+    "webhook_events": [
+        IndexModel([("event_id", ASCENDING)], unique=True),
+        # Stripe stops retrying a delivery after three days
+        IndexModel([("received_at", ASCENDING)], expireAfterSeconds=7 * 86400),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "hotel_cache": [
+        IndexModel([("destination", ASCENDING), ("check_in", ASCENDING), ("check_out", ASCENDING), ("expires_at", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=CACHE_STALE_SECONDS),
+    ],
+    "hotel_details_cache": [
+        IndexModel([("hotel_id", ASCENDING), ("expires_at", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=CACHE_STALE_SECONDS),
+    ],
+}
+
+CHECKED_OPTIONS = ("unique", "expireAfterSeconds", "partialFilterExpression")
+# Index usage counters reset when mongod restarts; only call an index unused
+# once it has been tracked for this long.
+UNUSED_AFTER = timedelta(days=1)
+
+
+def _key(spec) -> Tuple[Tuple[str, Any], ...]:
+    return tuple((field, direction) for field, direction in spec)
+
+
+async def _ensure_collection(db, collection_name: str, models: List[IndexModel], report: Dict[str, List[str]], now: datetime) -> None:
+    collection = db[collection_name]
+    existing = {_key(info["key"]): (name, info) for name, info in (await collection.index_information()).items()}
+    declared = set()
+
+    for model in models:
+        document = model.document
+        key = _key(document["key"].items())
+        declared.add(key)
+        label = f"{collection_name}.{'_'.join(field for field, _ in key)}"
+        if key not in existing:
+            try:
+                await collection.create_indexes([model])
+                report["created"].append(label)
+            except OperationFailure as e:
+                report["failed"].append(f"{label}: {e}")
+            continue
+
+        name, info = existing[key]
+        for option in CHECKED_OPTIONS:
+            if info.get(option) == document.get(option):
+                continue
+            if option == "expireAfterSeconds" and document.get(option) is not None and info.get(option) is not None:
+                try:
+                    await db.command("collMod", collection_name, index={"name": name, "expireAfterSeconds": document[option]})
+                    report["ttl_updated"].append(f"{label}: {info.get(option)} -> {document[option]}")
+                except OperationFailure as e:
+                    report["failed"].append(f"{label}: collMod expireAfterSeconds: {e}")
+            else:
+                report["mismatched"].append(f"{label}: {option} is {info.get(option)!r}, declared {document.get(option)!r}")
+
+    for key, (name, _) in existing.items():
+        if name != "_id_" and key not in declared:
+            report["undeclared"].append(f"{collection_name}.{name}")
+
+    try:
+        async for stats in collection.aggregate([{"$indexStats": {}}]):
+            since = stats["accesses"]["since"]
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0 and now - since > UNUSED_AFTER:
+                report["unused"].append(f"{collection_name}.{stats['name']}")
+    except (OperationFailure, NotImplementedError):
+        pass  # $indexStats needs clusterMonitor privileges on some hosted tiers, and mongomock lacks it
+
+
+async def ensure_indexes(db, specs: Dict[str, List[IndexModel]] = INDEX_SPECS) -> Dict[str, List[str]]:
+    """Create missing declared indexes and report how the live ones differ from the schema.
+
+    Returns lists of "collection.key" entries: created, failed (could not be
+    built, e.g. duplicates under a unique index, or a collection that could
+    not be checked at all), mismatched options, updated TTLs, undeclared
+    indexes, and declared indexes with no recorded use in the last
+    UNUSED_AFTER. A failure on one collection doesn't stop the others.
+    """
+    now = datetime.now(timezone.utc)
+    report: Dict[str, List[str]] = {key: [] for key in ("created", "failed", "mismatched", "ttl_updated", "undeclared", "unused")}
+
+    for collection_name, models in specs.items():
+        try:
+            await _ensure_collection(db, collection_name, models, report, now)
+        except Exception as e:
+            report["failed"].append(f"{collection_name}: {e!r}")
+
+    for kind in ("failed", "mismatched", "undeclared", "unused"):
+        for entry in report[kind]:
+            logger.warning(f"Mongo index {kind}: {entry}")
+    if report["created"]:
+        logger.info(f"Created Mongo indexes: {', '.join(report['created'])}")
+    return report
@@ -0,0 +1,90 @@
+import unicodedata
+from bisect import bisect_left
+from typing import Collection, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set
+
+MIN_FUZZY_LENGTH = 4
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accent-free, single-spaced form used for matching"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).lower().split())
+
+
+def deletions(text: str) -> Set[str]:
+    """`text` and every string one character shorter than it"""
+    return {text} | {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+class Destination(NamedTuple):
+    name: str
+    country: Optional[str]
+    kind: str
+    hotel_count: int
+    supported: bool
+
+
+class DestinationIndex:
+    """Destination autocomplete over catalog cities and countries plus the Booking.com city list.
+
+    Every destination is reachable from a sorted array of its normalized name
+    and each word suffix of it ("beach" finds Miami Beach), so a prefix lookup
+    is two bisections. When prefixes don't fill the page, a deletion
+    neighbourhood (every name prefix of MIN_FUZZY_LENGTH or more and its
+    one-character deletions) catches typos with a handful of dict lookups.
+    """
+
+    def __init__(self, hotels: Sequence[Mapping], cities: Iterable[str] = (), supported: Collection[str] = ()):
+        city_rows: Dict[str, List] = {}
+        country_rows: Dict[str, List] = {}
+        for hotel in hotels:
+            city, country = hotel["city"], hotel["country"]
+            city_rows.setdefault(normalize(city), [city, country, 0])[2] += 1
+            country_rows.setdefault(normalize(country), [country, None, 0])[2] += 1
+        for city in cities:
+            city_rows.setdefault(normalize(city), [city.title(), None, 0])
+
+        supported_keys = {normalize(city) for city in supported}
+        self.destinations: List[Destination] = [
+            Destination(name, country, "city", count, key in supported_keys) for key, (name, country, count) in city_rows.items()
+        ] + [
+            Destination(name, None, "country", count, False) for name, _, count in country_rows.values()
+        ]
+        self._rank = [(-d.hotel_count, d.kind != "city", d.name) for d in self.destinations]
+
+        entries = set()
+        self._fuzzy: Dict[str, Set[int]] = {}
+        for i, destination in enumerate(self.destinations):
+            words = normalize(destination.name).split(" ")
+            for start in range(len(words)):
+                key = " ".join(words[start:])
+                entries.add((key, i))
+                for length in range(MIN_FUZZY_LENGTH, len(key) + 1):
+                    for variant in deletions(key[:length]):
+                        self._fuzzy.setdefault(variant, set()).add(i)
+        entries = sorted(entries)
+        self._keys = [key for key, _ in entries]
+        self._ids = [i for _, i in entries]
+        self._popular = sorted(range(len(self.destinations)), key=self._rank.__getitem__)
+
+    def __len__(self) -> int:
+        return len(self.destinations)
+
+    def _prefixed(self, prefix: str) -> Set[int]:
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + "\uffff", start)
+        return set(self._ids[start:end])
+
+    def suggest(self, query: str, limit: int = 8) -> List[Destination]:
+        """Destinations starting with `query`, then near misses, each group busiest first"""
+        query = normalize(query)
+        if not query:
+            return [self.destinations[i] for i in self._popular[:limit]]
+        matches = sorted(self._prefixed(query), key=self._rank.__getitem__)
+        if len(matches) < limit and len(query) >= MIN_FUZZY_LENGTH:
+            near: Set[int] = set()
+            for variant in deletions(query):
+                near.update(self._fuzzy.get(variant, ()))
+            near.difference_update(matches)
+            matches += sorted(near, key=self._rank.__getitem__)
+        return [self.destinations[i] for i in matches[:limit]]
@@ -0,0 +1,171 @@
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Bit n of a hotel's sold-out mask is the night EPOCH + n days
+EPOCH = date(2000, 1, 1)
+MAX_NIGHTS = 60
+
+
+def stay_nights(check_in: str, check_out: str) -> List[date]:
+    """The nights of a stay, check-in inclusive and check-out exclusive; ValueError if the range is invalid"""
+    start, end = date.fromisoformat(check_in), date.fromisoformat(check_out)
+    if end <= start:
+        raise ValueError("check_out must be after check_in")
+    if (end - start).days > MAX_NIGHTS:
+        raise ValueError(f"stays are limited to {MAX_NIGHTS} nights")
+    if start < EPOCH:
+        raise ValueError(f"dates before {EPOCH} are not supported")
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+class AvailabilityIndex:
+    """Sold-out nights per hotel, each hotel's kept as an int bitset.
+
+    Only hotels with at least one sold-out night have an entry, so checking a
+    date range against every hotel touches just those and costs a shift and a
+    mask per hotel, however many bookings the nights hold.
+    """
+
+    def __init__(self):
+        self._sold_out: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._sold_out)
+
+    def mark(self, hotel_id: int, night: date, sold_out: bool) -> None:
+        bit = 1 << (night - EPOCH).days
+        mask = self._sold_out.get(hotel_id, 0)
+        mask = mask | bit if sold_out else mask & ~bit
+        if mask:
+            self._sold_out[hotel_id] = mask
+        else:
+            self._sold_out.pop(hotel_id, None)
+
+    def is_available(self, hotel_id: int, start: date, end: date) -> bool:
+        offset, span = (start - EPOCH).days, (end - start).days
+        return not (self._sold_out.get(hotel_id, 0) >> offset) & ((1 << span) - 1)
+
+    def unavailable(self, start: date, end: date) -> Set[int]:
+        """Hotels sold out on at least one night in [start, end)"""
+        offset, window = (start - EPOCH).days, (1 << (end - start).days) - 1
+        return {hotel_id for hotel_id, mask in self._sold_out.items() if (mask >> offset) & window}
+
+    def replace(self, sold_out: Dict[int, int]) -> None:
+        self._sold_out = sold_out
+
+
+class RoomInventory:
+    """Per-hotel, per-night booked room counts in Mongo, plus an in-process sold-out index.
+
+    Each night is a `room_inventory` document {hotel_id, night, booked}, whose
+    _id is derived from the hotel and night so it exists at most once whether
+    or not the unique index has been provisioned. A stay first creates any
+    missing nights at zero, then reserves each with one conditional `$inc`
+    that only matches while enough rooms are left, so concurrent bookings
+    can't oversell it. A stay either
+    reserves all its nights or releases those it already took. The sold-out
+    index follows this process's reservations and is rebuilt from Mongo by
+    `load`, which picks up other workers' bookings.
+    """
+
+    def __init__(self, rooms_per_hotel: int = 20):
+        self.rooms_per_hotel = rooms_per_hotel
+        self.availability = AvailabilityIndex()
+        self.reservations = 0
+        self.rejections = 0
+
+    async def _create_nights(self, collection, hotel_id: int, nights: List[date]) -> None:
+        """Make sure every night has a document, new ones at zero rooms booked.
+
+        Runs outside any transaction (before its first read, so the transaction
+        sees the documents). A concurrent booking creating the same night fails
+        on the _id and is ignored, as the night then exists.
+        """
+        requests = [
+            UpdateOne(
+                {"hotel_id": hotel_id, "night": night.isoformat()},
+                {"$setOnInsert": {"_id": f"{hotel_id}:{night.isoformat()}", "booked": 0}},
+                upsert=True,
+            )
+            for night in nights
+        ]
+        try:
+            await collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    async def _reserve_night(self, collection, hotel_id: int, night: date, rooms: int, session=None) -> Optional[int]:
+        """Booked count after taking `rooms` on a night, or None if there aren't enough left"""
+        query = {"hotel_id": hotel_id, "night": night.isoformat(), "booked": {"$lte": self.rooms_per_hotel - rooms}}
+        doc = await collection.find_one_and_update(query, {"$inc": {"booked": rooms}}, return_document=ReturnDocument.AFTER, session=session)
+        return None if doc is None else doc["booked"]
+
+    async def reserve(self, collection, hotel_id: int, nights: List[date], rooms: int = 1, session=None) -> bool:
+        """Take `rooms` on every night of a stay, or none of them; False if any night is sold out.
+
+        Inside a transaction (`session`) the sold-out index is left alone, as the
+        transaction may still abort; call `sync` once it has committed.
+        """
+        reserved: List[date] = []
+        if rooms <= self.rooms_per_hotel:
+            await self._create_nights(collection, hotel_id, nights)
+            for night in nights:
+                booked = await self._reserve_night(collection, hotel_id, night, rooms, session)
+                if booked is None:
+                    break
+                reserved.append(night)
+                if booked >= self.rooms_per_hotel and session is None:
+                    self.availability.mark(hotel_id, night, True)
+        if len(reserved) == len(nights):
+            self.reservations += 1
+            return True
+        self.rejections += 1
+        if session is None:
+            await self.release(collection, hotel_id, reserved, rooms)
+        return False
+
+    async def release(self, collection, hotel_id: int, nights: List[date], rooms: int = 1, session=None) -> None:
+        for night in nights:
+            await collection.update_one({"hotel_id": hotel_id, "night": night.isoformat()}, {"$inc": {"booked": -rooms}}, session=session)
+            self.availability.mark(hotel_id, night, False)
+
+    async def sync(self, collection, hotel_id: int, nights: List[date]) -> None:
+        """Update the sold-out index for some nights of a hotel from their committed counts"""
+        query = {"hotel_id": hotel_id, "night": {"$in": [night.isoformat() for night in nights]}}
+        booked = {doc["night"]: doc["booked"] async for doc in collection.find(query, {"_id": 0, "night": 1, "booked": 1})}
+        for night in nights:
+            self.availability.mark(hotel_id, night, booked.get(night.isoformat(), 0) >= self.rooms_per_hotel)
+
+    def unavailable(self, check_in: str, check_out: str) -> Set[int]:
+        """Hotels sold out on some night of the stay; empty if the dates don't parse"""
+        try:
+            nights = stay_nights(check_in, check_out)
+        except ValueError:
+            return set()
+        return self.availability.unavailable(nights[0], nights[-1] + timedelta(days=1))
+
+    async def load(self, collection, since: Optional[date] = None) -> None:
+        """Rebuild the sold-out index from the sold-out nights from `since` (default today) on"""
+        since = since or date.today()
+        sold_out: Dict[int, int] = {}
+        query = {"night": {"$gte": since.isoformat()}, "booked": {"$gte": self.rooms_per_hotel}}
+        async for doc in collection.find(query, {"_id": 0, "hotel_id": 1, "night": 1}):
+            bit = 1 << (date.fromisoformat(doc["night"]) - EPOCH).days
+            sold_out[doc["hotel_id"]] = sold_out.get(doc["hotel_id"], 0) | bit
+        self.availability.replace(sold_out)
+        logger.info(f"Loaded room inventory: {len(sold_out)} hotels with sold-out nights")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "rooms_per_hotel": self.rooms_per_hotel,
+            "hotels_with_sold_out_nights": len(self.availability),
+            "reservations": self.reservations,
+            "rejections": self.rejections,
+        }
@@ -0,0 +1,181 @@
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+PREFIX = "luxurystay_"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Samples = Iterable[Tuple[Sequence[str], float]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label set. Updated from the event loop only, so it needs no lock."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = PREFIX + name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Fixed-bucket histogram per label set; an observation is one bisect and two additions."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = PREFIX + name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Collected:
+    """Gauge or counter whose samples are read from existing stats when scraped"""
+
+    def __init__(self, type: str, name: str, help: str, labelnames: Sequence[str], collect: Callable[[], Samples]):
+        self.type, self.name, self.help, self.labelnames = type, PREFIX + name, help, tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in self.collect() if value is not None]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+        self.before_render: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for hook in self.before_render:
+            hook()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template", ("method", "route", "status")
+))
+UPSTREAM_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "upstream_request_duration_seconds", "Outbound HTTP request latency, by upstream and status code", ("upstream", "method", "status")
+))
+MONGO_COMMAND_DURATION = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency, by collection and command", ("collection", "command")
+))
+MONGO_COMMAND_FAILURES = REGISTRY.register(Counter(
+    "mongo_command_failures_total", "Mongo commands that returned an error", ("collection", "command")
+))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Feeds MONGO_COMMAND_DURATION from pymongo command events.
+
+    Motor runs pymongo on worker threads, so events are only appended to a
+    deque here (thread-safe without a lock) and folded into the histogram on
+    the event loop when metrics are scraped. Samples beyond `backlog` between
+    scrapes are dropped, oldest first.
+    """
+
+    def __init__(self, backlog: int = 65536):
+        self._targets: Dict[Tuple[Any, int], str] = {}
+        self._events: deque = deque(maxlen=backlog)
+        REGISTRY.before_render.append(self.drain)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            target = event.command.get("collection", "")
+        self._targets[(event.connection_id, event.request_id)] = target
+
+    def _finished(self, event, ok: bool) -> None:
+        target = self._targets.pop((event.connection_id, event.request_id), "")
+        self._events.append((target, event.command_name, event.duration_micros / 1e6, ok))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event, True)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event, False)
+
+    def drain(self) -> None:
+        events = self._events
+        while events:
+            collection, command, seconds, ok = events.popleft()
+            MONGO_COMMAND_DURATION.observe(seconds, collection, command)
+            if not ok:
+                MONGO_COMMAND_FAILURES.inc(collection, command)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP_REQUEST_DURATION, labelled by route template rather than raw path"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope["method"], getattr(route, "path", "unmatched"), status)
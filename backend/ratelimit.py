@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Collection, Dict, NamedTuple, Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class Limit(NamedTuple):
+    """`rate` requests per second on average, bursts of up to `burst`"""
+
+    rate: float
+    burst: int
+
+    @classmethod
+    def parse(cls, text: str) -> "Limit":
+        """Parse "rate/burst", e.g. "2/20" for 2 per second with bursts of 20"""
+        rate, _, burst = text.partition("/")
+        return cls(float(rate), int(burst or max(1, math.ceil(float(rate)))))
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+
+
+def client_id(session_token: Optional[str], ip: Optional[str]) -> str:
+    """Bucket identity: the session when there is a verified one (hashed, never stored raw), else the client address"""
+    if session_token:
+        return "s:" + hashlib.sha1(session_token.encode()).hexdigest()[:20]
+    return f"ip:{ip or 'unknown'}"
+
+
+class MemoryBucketStore:
+    """Token buckets for a single process.
+
+    Each bucket is stored as its theoretical arrival time (GCRA): the moment it
+    will be full again. A request pushes it 1/rate into the future and is
+    refused if that would put it more than burst/rate ahead of now, which
+    admits exactly what a token bucket of `burst` tokens refilled at `rate`
+    would. Idle buckets are dropped least recently used first past `maxsize`.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    async def take(self, key: str, limit: Limit) -> Decision:
+        now = time.time()
+        interval = 1 / limit.rate
+        tat = max(self._tat.get(key, now), now) + interval
+        excess = tat - now - limit.burst * interval
+        if excess > 0:
+            return Decision(False, excess)
+        self._tat[key] = tat
+        self._tat.move_to_end(key)
+        while len(self._tat) > self.maxsize:
+            self._tat.popitem(last=False)
+        return Decision(True)
+
+
+class MongoBucketStore:
+    """The same buckets shared by every worker through a Mongo collection.
+
+    One document per bucket holds its theoretical arrival time; a request is a
+    single conditional update (two when the bucket is already partly drained),
+    so concurrent workers can't both spend the last token. Documents carry an
+    `expires_at` for a TTL index, as a bucket left alone that long is full
+    anyway. A refusal reports the minimum wait of one refill interval.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def take(self, key: str, limit: Limit) -> Decision:
+        now = time.time()
+        interval = 1 / limit.rate
+        window = limit.burst * interval
+        update = {"expires_at": datetime.fromtimestamp(now + window, timezone.utc)}
+        try:
+            # Full (idle or new) bucket
+            await self.collection.update_one({"_id": key, "tat": {"$lte": now}}, {"$set": {"tat": now + interval, **update}}, upsert=True)
+            return Decision(True)
+        except DuplicateKeyError:
+            pass
+        result = await self.collection.update_one(
+            {"_id": key, "tat": {"$gt": now, "$lte": now + window - interval}}, {"$inc": {"tat": interval}, "$set": update}
+        )
+        return Decision(True) if result.modified_count else Decision(False, interval)
+
+
+class RateLimiter:
+    """Per-client budgets keyed by route template, with `default` for unlisted routes.
+
+    If the store fails (e.g. Mongo is unreachable) requests are let through
+    rather than refused.
+    """
+
+    def __init__(self, store, budgets: Dict[str, Limit], default: Limit, exempt: Collection[str] = ()):
+        self.store = store
+        self.budgets = budgets
+        self.default = default
+        self.exempt = set(exempt)
+        self.allowed = 0
+        self.limited = 0
+        self.store_errors = 0
+
+    async def check(self, route: str, client: str) -> Decision:
+        if route in self.exempt:
+            return Decision(True)
+        limit = self.budgets.get(route, self.default)
+        try:
+            decision = await self.store.take(f"{route}|{client}", limit)
+        except PyMongoError as e:
+            self.store_errors += 1
+            logger.error(f"Rate limit store unavailable, letting request through: {str(e)}")
+            return Decision(True)
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": type(self.store).__name__,
+            "buckets": len(self.store) if isinstance(self.store, MemoryBucketStore) else None,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "store_errors": self.store_errors,
+        }
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"over capacity, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Caps concurrent calls to an upstream and sheds the excess.
+
+    At most `limit` calls hold a slot. A caller that finds every slot taken
+    waits up to `max_wait` seconds for one and is then refused with
+    Overloaded, so requests fail fast instead of queueing for the connection
+    pool until they time out.
+    """
+
+    def __init__(self, limit: int, max_wait: float = 0.25):
+        self.limit = limit
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_use = 0
+        self.admitted = 0
+        self.shed = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                raise Overloaded(1.0) from None
+        else:
+            await self._semaphore.acquire()
+        self.in_use += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "in_use": self.in_use, "admitted": self.admitted, "shed": self.shed}
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def jittered_backoff(attempt: int, base: float = 0.1, cap: float = 2.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fails calls fast while an upstream keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `allow()` refuses calls for `reset_timeout` seconds. Then a single trial
+    call is let through (half-open): success closes the circuit, failure opens
+    it for another `reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_started = None
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._trial_started = None
+        # A trial whose caller never reported back (e.g. cancelled) is given up on after reset_timeout
+        if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+            self.rejected += 1
+            return False
+        self._trial_started = now
+        return True
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opens += 1
+                logger.warning(f"Circuit {self.name} opened after {self.failures} consecutive failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._trial_started = None
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial call through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 1),
+        }
+
+
+class RetryBudget:
+    """Caps retries at a fraction of recent traffic so they can't multiply load on a struggling upstream.
+
+    Every call deposits `ratio` of a token and every retry spends a whole one;
+    `min_per_second` tokens trickle in regardless so low-traffic periods can
+    still retry. The balance never exceeds `capacity`.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, capacity: float = 50.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.balance = capacity
+        self._updated = time.monotonic()
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self, amount: float) -> None:
+        now = time.monotonic()
+        amount += (now - self._updated) * self.min_per_second
+        self._updated = now
+        self.balance = min(self.capacity, self.balance + amount)
+
+    def deposit(self) -> None:
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill(0.0)
+        if self.balance < 1:
+            self.exhausted += 1
+            return False
+        self.balance -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill(0.0)
+        return {"balance": round(self.balance, 1), "retries": self.retries, "exhausted": self.exhausted}
+
+
+class Revalidator:
+    """Background refreshes for stale cache entries, at most one running per key.
+
+    Callers serve the stale value straight away and `schedule` the refresh;
+    failures are logged and counted, never raised to the request that
+    triggered them.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.failed = 0
+
+    def schedule(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._tasks:
+            return
+        self.started += 1
+        task = asyncio.ensure_future(fn())
+        self._tasks[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+            logger.warning(f"Background refresh of {key} failed: {task.exception()!r}")
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._tasks), "started": self.started, "failed": self.failed}
@@ -1,25 +1,106 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, BackgroundTasks, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 import os
+import time
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import List, Optional, Dict, Any, Collection, Iterable, Iterator, Literal
 import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
-import random
+import hashlib
+import base64
+import json
+from itertools import islice
 from contextlib import asynccontextmanager
+from catalog import CatalogViews, HotelCatalog
+from catalog_store import CatalogFormatError, read_catalog, read_source
+from destinations import DestinationIndex
+from upstream import UpstreamClient
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, Collected, MetricsMiddleware, MongoCommandListener
+from singleflight import SingleFlight
+from cache import SessionCache, TieredCache, TTLCache, is_fresh, to_timestamp
+from db_indexes import CACHE_STALE_SECONDS, ensure_indexes
+from inventory import RoomInventory, stay_nights
+from webhooks import PAYMENT_EVENTS, WebhookPipeline, WebhookSignatureError, verify_signature
+from resilience import CircuitBreaker, RetryBudget, Revalidator, jittered_backoff
+from warmer import CacheWarmer, PopularityTracker
+from ratelimit import AdmissionGate, Limit, MemoryBucketStore, MongoBucketStore, Overloaded, RateLimiter, client_id
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener()])
 db = client[os.environ['DB_NAME']]
+ENSURE_MONGO_INDEXES = os.environ.get('ENSURE_MONGO_INDEXES', 'true').lower() in ('1', 'true', 'yes')
+mongo_index_report: Dict[str, List[str]] = {}
+MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', 'false').lower() in ('1', 'true', 'yes')
+
+AUTH_SESSION_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+booking_http = UpstreamClient("booking", "BOOKING", timeout=30.0)
+auth_http = UpstreamClient("auth", "AUTH", timeout=10.0)
+booking_flight = SingleFlight()
+booking_breaker = CircuitBreaker("booking", int(os.environ.get('BOOKING_BREAKER_FAILURES', 5)), float(os.environ.get('BOOKING_BREAKER_RESET_SECONDS', 30)))
+booking_retry_budget = RetryBudget(float(os.environ.get('BOOKING_RETRY_BUDGET', 0.2)))
+BOOKING_MAX_ATTEMPTS = int(os.environ.get('BOOKING_MAX_ATTEMPTS', 3))
+BOOKING_API_DEADLINE = float(os.environ.get('BOOKING_API_DEADLINE', 10))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+cache_revalidator = Revalidator()
+hotel_search_cache = TieredCache(int(os.environ.get('HOTEL_CACHE_MEMORY_SIZE', 1024)), CACHE_STALE_SECONDS)
+hotel_details_cache = TieredCache(int(os.environ.get('HOTEL_DETAILS_CACHE_MEMORY_SIZE', 4096)), CACHE_STALE_SECONDS)
+search_popularity = PopularityTracker(float(os.environ.get('CACHE_WARMER_HALF_LIFE', 3600)))
+CACHE_WARMER_ENABLED = os.environ.get('CACHE_WARMER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+booking_admission = AdmissionGate(
+    int(os.environ.get('BOOKING_MAX_IN_FLIGHT', booking_http.limits.max_connections)),
+    float(os.environ.get('BOOKING_ADMISSION_WAIT', 0.25))
+)
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Proxies in front of the app whose X-Forwarded-For entries can be trusted ("true" for one)
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get('RATE_LIMIT_TRUST_FORWARDED', 'false').lower()
+SESSION_LOOKUP_BUDGET = "session lookup"
+RATE_LIMIT_TRUSTED_PROXIES = 1 if RATE_LIMIT_TRUST_FORWARDED in ('true', 'yes') else int(RATE_LIMIT_TRUST_FORWARDED) if RATE_LIMIT_TRUST_FORWARDED.isdigit() else 0
+rate_limiter = RateLimiter(
+    MongoBucketStore(db.rate_limits) if os.environ.get('RATE_LIMIT_STORE', 'memory') == 'mongo' else MemoryBucketStore(),
+    {
+        "/api/hotels/search": Limit.parse(os.environ.get('RATE_LIMIT_SEARCH', '2/20')),
+        "/api/hotels/batch": Limit.parse(os.environ.get('RATE_LIMIT_BATCH', '1/10')),
+        "/api/hotels/{hotel_id}": Limit.parse(os.environ.get('RATE_LIMIT_DETAILS', '5/50')),
+        "/api/bookings/create": Limit.parse(os.environ.get('RATE_LIMIT_BOOKINGS', '0.2/5')),
+        # Not a route: lookups of session tokens not seen lately, per address
+        SESSION_LOOKUP_BUDGET: Limit.parse(os.environ.get('RATE_LIMIT_SESSION_LOOKUPS', '1/10')),
+    },
+    Limit.parse(os.environ.get('RATE_LIMIT_DEFAULT', '20/100')),
+    exempt=("/api/webhook/stripe", "/api/metrics"),
+)
+HOTEL_BATCH_MAX_IDS = int(os.environ.get('HOTEL_BATCH_MAX_IDS', 100))
+HOTEL_BATCH_CONCURRENCY = int(os.environ.get('HOTEL_BATCH_CONCURRENCY', 8))
+room_inventory = RoomInventory(int(os.environ.get('ROOMS_PER_HOTEL', 20)))
+INVENTORY_REFRESH_SECONDS = float(os.environ.get('INVENTORY_REFRESH_SECONDS', 60))
+settled_checkouts = TTLCache(int(os.environ.get('CHECKOUT_STATUS_CACHE_SIZE', 10000)))
+CHECKOUT_STATUS_CACHE_TTL = float(os.environ.get('CHECKOUT_STATUS_CACHE_TTL', 300))
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+webhook_pipeline = WebhookPipeline(int(os.environ.get('WEBHOOK_QUEUE_SIZE', 10000)), int(os.environ.get('WEBHOOK_BATCH_SIZE', 200)))
+session_cache = SessionCache(int(os.environ.get('SESSION_CACHE_SIZE', 10000)), float(os.environ.get('SESSION_CACHE_TTL', 60)))
+# Session token -> whether it belongs to a live session, so rate limiting looks each token up at most once per SESSION_CACHE_TTL
+rate_limit_sessions = TTLCache(int(os.environ.get('SESSION_CACHE_SIZE', 10000)))
+
+async def refresh_room_inventory():
+    """Keep the sold-out index in step with bookings taken by other workers"""
+    while True:
+        try:
+            await room_inventory.load(db.room_inventory)
+        except Exception as e:
+            logger.error(f"Failed to load room inventory: {str(e)}")
+        await asyncio.sleep(INVENTORY_REFRESH_SECONDS)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -29,8 +110,27 @@ async def lifespan(app: FastAPI):
         print("✅ Successfully connected to MongoDB!")
     except Exception as e:
         print(f"❌ Failed to connect to MongoDB: {e}")
+    if ENSURE_MONGO_INDEXES:
+        try:
+            mongo_index_report.update(await ensure_indexes(db))
+        except Exception as e:
+            print(f"❌ Failed to provision MongoDB indexes: {e}")
+    inventory_refresh = asyncio.create_task(refresh_room_inventory())
+    if not STRIPE_WEBHOOK_SECRET:
+        print("❌ STRIPE_WEBHOOK_SECRET is not set; Stripe webhooks will be refused (and retried by Stripe) until it is")
+    webhook_pipeline.start(db)
+    if USE_REAL_API and CACHE_WARMER_ENABLED:
+        search_warmer.start()
+    await booking_http.start()
+    await auth_http.start()
     yield
-    # Shutdown: Close connection
+    # Shutdown: Close connections
+    inventory_refresh.cancel()
+    await search_warmer.stop()
+    await cache_revalidator.close()
+    await webhook_pipeline.stop()
+    await booking_http.close()
+    await auth_http.close()
     client.close()
     print("MongoDB connection closed.")
 
@@ -41,6 +141,7 @@ BOOKING_API_KEY = os.environ.get('BOOKING_API_KEY', 'YOUR_API_KEY_HERE')
 BOOKING_AFFILIATE_ID = os.environ.get('BOOKING_AFFILIATE_ID', 'YOUR_AFFILIATE_ID_HERE')
 BOOKING_API_BASE_URL = os.environ.get('BOOKING_API_BASE_URL', 'https://demandapi-sandbox.booking.com/3.1')
 USE_REAL_API = BOOKING_API_KEY != 'YOUR_API_KEY_HERE' and BOOKING_API_KEY != ''
+CATALOG_RESPONSE_CACHE = os.environ.get('CATALOG_RESPONSE_CACHE', 'true').lower() in ('1', 'true', 'yes')
 
 CITY_ID_MAPPING = {
     "miami": -1548846,
@@ -67,93 +168,103 @@ CITY_ID_MAPPING = {
     "seattle": -1771260
 }
 
-MOCK_HOTELS = [
-    {
-        "id": 1001,
-        "name": "Azure Bay Resort & Spa",
-        "city": "Mumbai",
-        "country": "India",
-        "description": "Luxury beachfront resort with stunning ocean views",
-        "price": 24999.0,
-        "currency": "INR",
-        "rating": 9.2,
-        "review_count": 1834,
-        "image_urls": [
-            "https://images.unsplash.com/photo-1724598571320-7d2b5584cff6?w=800",
-            "https://images.unsplash.com/photo-1629140727571-9b5c6f6267b4?w=800",
-            "https://images.unsplash.com/photo-1770017408222-dc83f61d9725?w=800"
-        ],
-        "amenities": ["Free WiFi", "Pool", "Spa", "Restaurant", "Beach Access", "Gym"]
-    },
-    {
-        "id": 1002,
-        "name": "Sunset Paradise Hotel",
-        "city": "Goa",
-        "country": "India",
-        "description": "Modern hotel in the heart of the city",
-        "price": 16599.0,
-        "currency": "INR",
-        "rating": 8.5,
-        "review_count": 892,
-        "image_urls": [
-            "https://images.unsplash.com/photo-1763110805060-80dbead1f9d3?w=800",
-            "https://images.unsplash.com/photo-1766928210443-0be92ed5884a?w=800",
-            "https://images.unsplash.com/photo-1769766407883-1645a93eed40?w=800"
-        ],
-        "amenities": ["Free WiFi", "Pool", "Parking", "Restaurant"]
-    },
-    {
-        "id": 1003,
-        "name": "Grand Palace Hotel",
-        "city": "Delhi",
-        "country": "India",
-        "description": "Elegant hotel in premium location",
-        "price": 29099.0,
-        "currency": "INR",
-        "rating": 9.0,
-        "review_count": 2156,
-        "image_urls": [
-            "https://images.unsplash.com/photo-1724598571320-7d2b5584cff6?w=800"
-        ],
-        "amenities": ["Free WiFi", "Concierge", "Restaurant", "Bar", "Room Service"]
-    },
-    {
-        "id": 1004,
-        "name": "Coastal Breeze Inn",
-        "city": "Chennai",
-        "country": "India",
-        "description": "Cozy inn with ocean views",
-        "price": 13259.0,
-        "currency": "INR",
-        "rating": 8.8,
-        "review_count": 654,
-        "image_urls": [
-            "https://images.unsplash.com/photo-1763110805060-80dbead1f9d3?w=800"
-        ],
-        "amenities": ["Free WiFi", "Breakfast", "Parking"]
-    },
-    {
-        "id": 1005,
-        "name": "Mountain View Lodge",
-        "city": "Manali",
-        "country": "India",
-        "description": "Rustic lodge with mountain views",
-        "price": 14919.0,
-        "currency": "INR",
-        "rating": 8.7,
-        "review_count": 423,
-        "image_urls": [
-            "https://images.unsplash.com/photo-1770017408222-dc83f61d9725?w=800"
-        ],
-        "amenities": ["Free WiFi", "Fireplace", "Hiking Trails", "Restaurant"]
-    }
-]
+def base_mock_hotels() -> List[Dict]:
+    """Built-in mock rows; load_catalog adds the extended catalog to them"""
+    return [
+        {
+            "id": 1001,
+            "name": "Azure Bay Resort & Spa",
+            "city": "Mumbai",
+            "country": "India",
+            "description": "Luxury beachfront resort with stunning ocean views",
+            "price": 24999.0,
+            "currency": "INR",
+            "rating": 9.2,
+            "review_count": 1834,
+            "image_urls": [
+                "https://images.unsplash.com/photo-1724598571320-7d2b5584cff6?w=800",
+                "https://images.unsplash.com/photo-1629140727571-9b5c6f6267b4?w=800",
+                "https://images.unsplash.com/photo-1770017408222-dc83f61d9725?w=800"
+            ],
+            "amenities": ["Free WiFi", "Pool", "Spa", "Restaurant", "Beach Access", "Gym"]
+        },
+        {
+            "id": 1002,
+            "name": "Sunset Paradise Hotel",
+            "city": "Goa",
+            "country": "India",
+            "description": "Modern hotel in the heart of the city",
+            "price": 16599.0,
+            "currency": "INR",
+            "rating": 8.5,
+            "review_count": 892,
+            "image_urls": [
+                "https://images.unsplash.com/photo-1763110805060-80dbead1f9d3?w=800",
+                "https://images.unsplash.com/photo-1766928210443-0be92ed5884a?w=800",
+                "https://images.unsplash.com/photo-1769766407883-1645a93eed40?w=800"
+            ],
+            "amenities": ["Free WiFi", "Pool", "Parking", "Restaurant"]
+        },
+        {
+            "id": 1003,
+            "name": "Grand Palace Hotel",
+            "city": "Delhi",
+            "country": "India",
+            "description": "Elegant hotel in premium location",
+            "price": 29099.0,
+            "currency": "INR",
+            "rating": 9.0,
+            "review_count": 2156,
+            "image_urls": [
+                "https://images.unsplash.com/photo-1724598571320-7d2b5584cff6?w=800"
+            ],
+            "amenities": ["Free WiFi", "Concierge", "Restaurant", "Bar", "Room Service"]
+        },
+        {
+            "id": 1004,
+            "name": "Coastal Breeze Inn",
+            "city": "Chennai",
+            "country": "India",
+            "description": "Cozy inn with ocean views",
+            "price": 13259.0,
+            "currency": "INR",
+            "rating": 8.8,
+            "review_count": 654,
+            "image_urls": [
+                "https://images.unsplash.com/photo-1763110805060-80dbead1f9d3?w=800"
+            ],
+            "amenities": ["Free WiFi", "Breakfast", "Parking"]
+        },
+        {
+            "id": 1005,
+            "name": "Mountain View Lodge",
+            "city": "Manali",
+            "country": "India",
+            "description": "Rustic lodge with mountain views",
+            "price": 14919.0,
+            "currency": "INR",
+            "rating": 8.7,
+            "review_count": 423,
+            "image_urls": [
+                "https://images.unsplash.com/photo-1770017408222-dc83f61d9725?w=800"
+            ],
+            "amenities": ["Free WiFi", "Fireplace", "Hiking Trails", "Restaurant"]
+        }
+    ]
 
-from pathlib import Path
-extended_hotels_file = Path(__file__).parent / 'extended_hotels.py'
-if extended_hotels_file.exists():
-    from extended_hotels import EXTENDED_HOTELS
-    MOCK_HOTELS.extend(EXTENDED_HOTELS)
+def load_extended_hotels() -> List[Dict]:
+    """Extended catalog from the compact file, falling back to parsing extended_hotels.py"""
+    extended_hotels_file = ROOT_DIR / 'extended_hotels.py'
+    compact_catalog_file = ROOT_DIR / 'extended_hotels.cat'
+    if compact_catalog_file.exists():
+        try:
+            return read_catalog(compact_catalog_file, check_source=True)
+        except CatalogFormatError as e:
+            logging.getLogger(__name__).warning(f"Ignoring {compact_catalog_file.name}: {e}. Rebuild it with 'python catalog_store.py build'")
+    if extended_hotels_file.exists():
+        # Parsed rather than imported, so the module doesn't keep its rows alive after load_catalog
+        return read_source(extended_hotels_file)
+    return []
 
 class HotelSearchRequest(BaseModel):
     destination: str
@@ -162,6 +273,16 @@ class HotelSearchRequest(BaseModel):
     num_adults: int = 1
     num_children: int = 0
     num_rooms: int = 1
+    sort_by: Optional[Literal["price", "rating", "review_count", "recommended"]] = None
+    sort_order: Literal["asc", "desc"] = "asc"
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    amenities: List[str] = []
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1, le=100)
+    seed: Optional[str] = Field(None, max_length=64)
 
 class HotelInfo(BaseModel):
     id: int
@@ -185,6 +306,7 @@ class BookingRequest(BaseModel):
     guest_email: EmailStr
     num_adults: int
     num_children: int = 0
+    num_rooms: int = Field(1, ge=1)
     total_price: float
 
 class BookingResponse(BaseModel):
@@ -210,21 +332,111 @@ class PaymentCheckoutRequest(BaseModel):
     booking_id: str
     origin_url: str
 
-async def get_current_user(authorization: Optional[str] = Header(None), request: Request = None) -> Dict:
-    session_token = None
-    
+class PreEncodedJSONResponse(Response):
+    """JSON response whose body is already-encoded bytes from the catalog cache"""
+    media_type = "application/json"
+
+def encode_hotel(hotel: Dict) -> bytes:
+    return HotelInfo(**hotel).model_dump_json().encode()
+
+def load_catalog() -> None:
+    """(Re)build the catalog repository, its search structures and response cache from the mock rows.
+
+    The rows are only held while loading; afterwards the catalog's interned records are the one copy.
+    """
+    global hotel_catalog, destination_index
+    hotel_catalog = HotelCatalog(base_mock_hotels() + load_extended_hotels(), encode=encode_hotel if CATALOG_RESPONSE_CACHE else None)
+    destination_index = DestinationIndex(hotel_catalog.hotels, CITY_ID_MAPPING, supported=CITY_ID_MAPPING)
+
+load_catalog()
+
+def session_token_from(request: Optional[Request], authorization: Optional[str]) -> Optional[str]:
     if request and "session_token" in request.cookies:
-        session_token = request.cookies.get("session_token")
-    elif authorization and authorization.startswith("Bearer "):
-        session_token = authorization.replace("Bearer ", "")
+        return request.cookies.get("session_token")
+    if authorization and authorization.startswith("Bearer "):
+        return authorization.replace("Bearer ", "")
+    return None
+
+def client_address(request: Request) -> Optional[str]:
+    """The caller's address. Behind RATE_LIMIT_TRUSTED_PROXIES proxies it is the X-Forwarded-For entry
+    the outermost one appended; anything before that was sent by the client and can be forged"""
+    ip = request.client.host if request.client else None
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if RATE_LIMIT_TRUSTED_PROXIES and forwarded:
+        ip = forwarded[-min(RATE_LIMIT_TRUSTED_PROXIES, len(forwarded))]
+    return ip
+
+def known_session(session_token: str) -> Optional[bool]:
+    """Whether `session_token` is live, from the session caches alone; None if it hasn't been checked lately"""
+    if session_cache.get(session_token) is not None:
+        return True
+    return rate_limit_sessions.get(session_token)
+
+async def check_session(session_token: str) -> bool:
+    """Look a session token up and remember for up to SESSION_CACHE_TTL whether it is live"""
+    try:
+        session_doc = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0, "expires_at": 1})
+    except PyMongoError as e:
+        logger.error(f"Could not check session for rate limiting: {str(e)}")
+        return False
+    deadline = time.time() + session_cache.ttl
+    if session_doc:
+        expires_at = session_doc["expires_at"]
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        if to_timestamp(expires_at) > time.time():
+            rate_limit_sessions.set(session_token, True, min(deadline, to_timestamp(expires_at)))
+            return True
+    rate_limit_sessions.set(session_token, False, deadline)
+    return False
+
+async def enforce_rate_limit(request: Request):
+    """Router-wide dependency: per-client token bucket for the matched route, 429 with Retry-After once it is spent.
+
+    Live sessions have their own buckets; everyone else, including made-up
+    tokens, shares their address's. Looking up a token not seen lately
+    spends the address's session lookup budget, so made-up tokens can't cause
+    more Mongo reads than that; once it is spent they count as anonymous.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    if route in rate_limiter.exempt:
+        return
+    session_token = session_token_from(request, request.headers.get("authorization"))
+    ip = client_address(request)
+    live = known_session(session_token) if session_token else False
+    if live is None and (await rate_limiter.check(SESSION_LOOKUP_BUDGET, client_id(None, ip))).allowed:
+        live = await check_session(session_token)
+    decision = await rate_limiter.check(route, client_id(session_token if live else None, ip))
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, round(decision.retry_after)))}
+        )
+
+async def get_current_user(authorization: Optional[str] = Header(None), request: Request = None) -> Dict:
+    session_token = session_token_from(request, authorization)
     
     if not session_token:
         return None
         # raise HTTPException(status_code=401, detail="Not authenticated")
     
-    session_doc = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
-    if not session_doc:
+    user_doc = session_cache.get(session_token)
+    if user_doc is not None:
+        return user_doc
+    
+    # Session and user in one round-trip
+    session_docs = await db.user_sessions.aggregate([
+        {"$match": {"session_token": session_token}},
+        {"$limit": 1},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "user_id", "as": "users"}},
+        {"$project": {"_id": 0, "expires_at": 1, "user": {"$arrayElemAt": ["$users", 0]}}}
+    ]).to_list(1)
+    if not session_docs:
         raise HTTPException(status_code=401, detail="Invalid session")
+    session_doc = session_docs[0]
     
     expires_at = session_doc["expires_at"]
     if isinstance(expires_at, str):
@@ -235,14 +447,73 @@ async def get_current_user(authorization: Optional[str] = Header(None), request:
     if expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=401, detail="Session expired")
     
-    user_doc = await db.users.find_one({"user_id": session_doc["user_id"]}, {"_id": 0})
+    user_doc = session_doc.get("user")
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
+    user_doc.pop("_id", None)
     
+    session_cache.set(session_token, user_doc, expires_at)
     return user_doc
 
+def selection(search_request: HotelSearchRequest, default_sort: Optional[str] = None, exclude: Collection[int] = ()) -> Dict[str, Any]:
+    """CatalogViews filter/sort arguments for a search request"""
+    return {
+        "sort_by": search_request.sort_by or (default_sort if search_request.seed is None else None),
+        "descending": search_request.sort_order == "desc",
+        "ranges": {
+            "price": (search_request.min_price, search_request.max_price),
+            "rating": (search_request.min_rating, search_request.max_rating),
+        },
+        "amenities": search_request.amenities,
+        "seed": search_request.seed,
+        "exclude": exclude,
+    }
+
+def select_page(views: CatalogViews, candidates: Optional[List[int]], search_request: HotelSearchRequest, default_sort: Optional[str] = None, exclude: Collection[int] = ()):
+    """Apply the request's filters, sort and page; returns (positions, next_offset)"""
+    return views.select(candidates, offset=search_request.offset, limit=search_request.limit, **selection(search_request, default_sort, exclude))
+
+def iterate_page(views: CatalogViews, candidates: Optional[List[int]], search_request: HotelSearchRequest, default_sort: Optional[str] = None, exclude: Collection[int] = ()) -> Iterator[int]:
+    """select_page as a lazy iterator of positions, for streaming"""
+    stop = None if search_request.limit is None else search_request.offset + search_request.limit
+    return islice(views.iterate(candidates, **selection(search_request, default_sort, exclude)), search_request.offset, stop)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_CHUNK_SIZE = 32
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_lines(records: Iterable[bytes]) -> Iterator[bytes]:
+    """Newline-delimited records, flushed NDJSON_CHUNK_SIZE at a time"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == NDJSON_CHUNK_SIZE:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+def set_next_offset(response: Response, next_offset: Optional[int]) -> None:
+    if next_offset is not None:
+        response.headers["X-Next-Offset"] = str(next_offset)
+
+def select_hotels(views: CatalogViews, candidates: Optional[List[int]], search_request: HotelSearchRequest, response: Response, default_sort: Optional[str] = None, exclude: Collection[int] = ()) -> List[int]:
+    """select_page that advertises the next page via X-Next-Offset"""
+    page, next_offset = select_page(views, candidates, search_request, default_sort, exclude)
+    set_next_offset(response, next_offset)
+    return page
+
 async def call_booking_api(endpoint: str, method: str = "GET", payload: Dict = None) -> Any:
-    """Make authenticated API calls to Booking.com"""
+    """Make authenticated API calls to Booking.com.
+
+    Timeouts, connection errors, 429 and 5xx responses are retried with
+    jittered backoff while the retry budget and BOOKING_API_DEADLINE allow.
+    Consecutive failures open booking_breaker, after which calls fail with 503
+    straight away instead of waiting on the upstream. So do calls that find
+    booking_admission full for longer than BOOKING_ADMISSION_WAIT.
+    """
     if not USE_REAL_API:
         raise HTTPException(status_code=503, detail="Booking.com API not configured")
     
@@ -253,70 +524,94 @@ async def call_booking_api(endpoint: str, method: str = "GET", payload: Dict = N
     }
     
     url = f"{BOOKING_API_BASE_URL}/{endpoint}"
+    deadline = time.monotonic() + BOOKING_API_DEADLINE
+    booking_retry_budget.deposit()
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    attempt = 0
+    while True:
+        if not booking_breaker.allow():
+            raise HTTPException(
+                status_code=503,
+                detail="Booking.com API temporarily unavailable",
+                headers={"Retry-After": str(max(1, round(booking_breaker.retry_after())))}
+            )
+        response = None
         try:
-            if method == "POST":
-                response = await client.post(url, json=payload, headers=headers)
-            else:
-                response = await client.get(url, headers=headers)
-            
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Booking.com API error {e.response.status_code}: {e.response.text}")
+            async with booking_admission.slot():
+                response = await asyncio.wait_for(
+                    booking_http.request(method, url, json=payload if method == "POST" else None, headers=headers),
+                    timeout=max(0.0, deadline - time.monotonic())
+                )
+        except Overloaded as e:
             raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Booking.com API error: {e.response.text}"
+                status_code=503,
+                detail="Booking.com API busy, try again shortly",
+                headers={"Retry-After": str(max(1, round(e.retry_after)))}
             )
-        except httpx.HTTPError as e:
-            logger.error(f"HTTP error calling Booking.com: {str(e)}")
-            raise HTTPException(status_code=503, detail="Unable to reach Booking.com API")
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            logger.error(f"HTTP error calling Booking.com (attempt {attempt + 1}): {e!r}")
+        else:
+            if response.status_code not in RETRYABLE_STATUS:
+                booking_breaker.record_success()
+                break
+            logger.error(f"Booking.com API error {response.status_code} (attempt {attempt + 1}): {response.text}")
+        
+        booking_breaker.record_failure()
+        attempt += 1
+        delay = jittered_backoff(attempt)
+        if attempt >= BOOKING_MAX_ATTEMPTS or time.monotonic() + delay >= deadline or not booking_retry_budget.withdraw():
+            break
+        await asyncio.sleep(delay)
+    
+    if response is None:
+        raise HTTPException(status_code=503, detail="Unable to reach Booking.com API")
+    if response.is_error:
+        if response.status_code not in RETRYABLE_STATUS:
+            logger.error(f"Booking.com API error {response.status_code}: {response.text}")
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Booking.com API error: {response.text}"
+        )
+    return response.json()
 
 @api_router.post("/auth/session")
 async def process_session(session_req: SessionRequest, response: JSONResponse = None):
     try:
-        async with httpx.AsyncClient() as client:
-            headers = {"X-Session-ID": session_req.session_id}
-            resp = await client.get(
-                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers=headers,
-                timeout=10.0
-            )
-            resp.raise_for_status()
-            user_data = resp.json()
+        headers = {"X-Session-ID": session_req.session_id}
+        resp = await auth_http.get(AUTH_SESSION_URL, headers=headers)
+        resp.raise_for_status()
+        user_data = resp.json()
         
         user_id = user_data["id"]
-        existing_user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
-        
-        if not existing_user:
-            user_doc = {
-                "user_id": user_id,
-                "email": user_data["email"],
-                "name": user_data["name"],
-                "picture": user_data["picture"],
-                "created_at": datetime.now(timezone.utc)
-            }
-            await db.users.insert_one(user_doc)
-        else:
-            await db.users.update_one(
-                {"user_id": user_id},
-                {"$set": {
+        await db.users.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
                     "name": user_data["name"],
                     "picture": user_data["picture"]
-                }}
-            )
+                },
+                "$setOnInsert": {
+                    "user_id": user_id,
+                    "email": user_data["email"],
+                    "created_at": datetime.now(timezone.utc)
+                }
+            },
+            upsert=True
+        )
+        session_cache.invalidate_user(user_id)
         
         session_token = user_data["session_token"]
         expires_at = datetime.now(timezone.utc) + timedelta(days=7)
         
-        session_doc = {
-            "user_id": user_id,
-            "session_token": session_token,
-            "expires_at": expires_at,
-            "created_at": datetime.now(timezone.utc)
-        }
-        await db.user_sessions.insert_one(session_doc)
+        # Upsert: session_token is unique, and the auth service may hand back the same token again
+        await db.user_sessions.update_one(
+            {"session_token": session_token},
+            {
+                "$set": {"user_id": user_id, "expires_at": expires_at},
+                "$setOnInsert": {"created_at": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
         
         user_response = {
             "user_id": user_id,
@@ -337,9 +632,11 @@ async def get_me(user: Dict = Depends(get_current_user)):
     return UserResponse(**user)
 
 @api_router.post("/auth/logout")
-async def logout(request: Request, user: Dict = Depends(get_current_user)):
-    session_token = request.cookies.get("session_token")
+async def logout(request: Request, user: Dict = Depends(get_current_user), authorization: Optional[str] = Header(None)):
+    session_token = session_token_from(request, authorization)
     if session_token:
+        session_cache.invalidate(session_token)
+        rate_limit_sessions.pop(session_token)
         await db.user_sessions.delete_one({"session_token": session_token})
     return {"message": "Logged out successfully"}
 
@@ -367,89 +664,212 @@ async def api_status():
         "booking_api_url": BOOKING_API_BASE_URL if USE_REAL_API else "N/A",
         "supported_cities": len(CITY_ID_MAPPING),
         "stripe_configured": bool(os.environ.get('STRIPE_API_KEY')),
+        "upstream_pools": {upstream.name: upstream.stats() for upstream in (booking_http, auth_http)},
+        "booking_single_flight": booking_flight.stats(),
+        "booking_circuit": booking_breaker.stats(),
+        "booking_retry_budget": booking_retry_budget.stats(),
+        "cache_revalidation": cache_revalidator.stats(),
+        "cache_warmer": search_warmer.stats(),
+        "booking_admission": booking_admission.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "hotel_cache": hotel_search_cache.stats(),
+        "hotel_details_cache": hotel_details_cache.stats(),
+        "mongo_indexes": {kind: len(entries) for kind, entries in mongo_index_report.items()},
+        "session_cache": session_cache.stats(),
+        "checkout_status_cache": settled_checkouts.stats(),
+        "stripe_webhooks": webhook_pipeline.stats(),
+        "room_inventory": room_inventory.stats(),
         "message": "Booking.com API credentials configured" if USE_REAL_API else "Using mock hotel data. Add BOOKING_API_KEY and BOOKING_AFFILIATE_ID to .env to enable real API"
     }
 
+def cache_lookups():
+    for name, cache in (("hotel_cache", hotel_search_cache), ("hotel_details_cache", hotel_details_cache)):
+        yield (name, "memory", "hit"), cache.memory.hits
+        yield (name, "memory", "miss"), cache.memory.misses
+        yield (name, "mongo", "hit"), cache.db_hits
+        yield (name, "mongo", "miss"), cache.db_misses
+    for name, memory in (("session_cache", session_cache.memory), ("checkout_status_cache", settled_checkouts)):
+        yield (name, "memory", "hit"), memory.hits
+        yield (name, "memory", "miss"), memory.misses
+
+def cache_hit_ratios():
+    for name, cache in (("hotel_cache", hotel_search_cache), ("hotel_details_cache", hotel_details_cache)):
+        lookups = cache.memory.hits + cache.memory.misses
+        yield (name,), (cache.memory.hits + cache.db_hits) / lookups if lookups else None
+    for name, memory in (("session_cache", session_cache.memory), ("checkout_status_cache", settled_checkouts)):
+        yield (name,), memory.stats()["hit_ratio"]
+
+REGISTRY.register(Collected("counter", "cache_lookups_total", "Cache lookups by tier and result", ("cache", "tier", "result"), cache_lookups))
+REGISTRY.register(Collected("gauge", "cache_hit_ratio", "Share of lookups answered from memory or Mongo without going upstream", ("cache",), cache_hit_ratios))
+REGISTRY.register(Collected("gauge", "upstream_in_flight", "Outbound requests currently in flight", ("upstream",), lambda: [((u.name,), u.in_flight) for u in (booking_http, auth_http)]))
+REGISTRY.register(Collected("counter", "booking_single_flight_shared_total", "Booking.com calls answered by joining one already in flight", (), lambda: [((), booking_flight.shared)]))
+REGISTRY.register(Collected("gauge", "upstream_circuit_open", "1 while the Booking.com circuit breaker rejects calls", ("upstream",), lambda: [((booking_breaker.name,), int(booking_breaker.state != "closed"))]))
+REGISTRY.register(Collected("counter", "upstream_retries_total", "Booking.com calls retried within the retry budget", ("upstream",), lambda: [((booking_breaker.name,), booking_retry_budget.retries)]))
+REGISTRY.register(Collected("counter", "cache_stale_served_total", "Expired cache entries served while a refresh ran", ("cache",), lambda: [(("hotel_cache",), hotel_search_cache.stale_hits), (("hotel_details_cache",), hotel_details_cache.stale_hits)]))
+REGISTRY.register(Collected("counter", "cache_warmer_refreshes_total", "Popular searches refreshed ahead of expiry by the warmer", ("result",), lambda: [(("ok",), search_warmer.refreshed), (("failed",), search_warmer.failed)]))
+REGISTRY.register(Collected("counter", "upstream_shed_total", "Booking.com calls refused because every admission slot was taken", ("upstream",), lambda: [((booking_breaker.name,), booking_admission.shed)]))
+REGISTRY.register(Collected("counter", "rate_limit_decisions_total", "Requests checked against per-client rate limits", ("result",), lambda: [(("allowed",), rate_limiter.allowed), (("limited",), rate_limiter.limited)]))
+REGISTRY.register(Collected("gauge", "webhook_queue_depth", "Stripe webhook events waiting for the worker", (), lambda: [((), webhook_pipeline.queue.qsize())]))
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: route, upstream and Mongo latency histograms and cache counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+def search_cache_key(search_request: HotelSearchRequest) -> tuple:
+    return (search_request.destination.lower(), search_request.check_in, search_request.check_out)
+
+async def load_search_results(search_request: HotelSearchRequest, city_id: int) -> List[Dict]:
+    """Cached or freshly fetched Booking.com results for a search, as HotelInfo dicts.
+
+    An expired entry still within CACHE_STALE_SECONDS is returned as is while
+    a background refresh replaces it.
+    """
+    cache_key = search_cache_key(search_request)
+    cached = await hotel_search_cache.lookup(db.hotel_cache, cache_key, {
+        "destination": search_request.destination.lower(),
+        "check_in": search_request.check_in,
+        "check_out": search_request.check_out
+    })
+    
+    if cached:
+        if is_fresh(cached):
+            logger.info(f"Returning cached results for {search_request.destination}")
+        else:
+            logger.info(f"Returning stale results for {search_request.destination} while refreshing")
+            cache_revalidator.schedule(("search",) + cache_key, lambda: fetch_search_results(search_request, city_id))
+        return cached["results"]
+    
+    return await fetch_search_results(search_request, city_id)
+
+async def fetch_search_results(search_request: HotelSearchRequest, city_id: int) -> List[Dict]:
+    """Fetch a search from Booking.com and store it in hotel_cache"""
+    payload = {
+        "booker": {
+            "country": "us",
+            "platform": "desktop"
+        },
+        "checkin": search_request.check_in,
+        "checkout": search_request.check_out,
+        "city": city_id,
+        "guests": {
+            "number_of_adults": search_request.num_adults,
+            "number_of_children": search_request.num_children,
+            "number_of_rooms": search_request.num_rooms
+        },
+        "extras": ["products", "extra_charges", "images"]
+    }
+    
+    response_data = await call_booking_api("accommodations/search", "POST", payload)
+    
+    hotels = []
+    for accommodation in response_data.get("data", [])[:15]:
+        try:
+            price_data = accommodation.get("price", {})
+            price = float(price_data.get("total", 0)) if price_data else 0
+            
+            hotel = HotelInfo(
+                id=accommodation.get("id", 0),
+                name=accommodation.get("name", "Unknown Hotel"),
+                city=search_request.destination,
+                country=accommodation.get("country", ""),
+                description=(accommodation.get("description", "Beautiful hotel")[:200] + "..."),
+                price=price,
+                currency=accommodation.get("currency", {}).get("accommodation", "USD"),
+                rating=float(accommodation.get("review_score", 0)),
+                review_count=accommodation.get("review_count", 0),
+                image_urls=accommodation.get("image_urls", [])[:4],
+                amenities=accommodation.get("facilities", [])[:6]
+            )
+            hotels.append(hotel.dict())
+        except Exception as e:
+            logger.error(f"Error parsing hotel data: {str(e)}")
+            continue
+    
+    if hotels:
+        cache_doc = {
+            "destination": search_request.destination.lower(),
+            "check_in": search_request.check_in,
+            "check_out": search_request.check_out,
+            "results": hotels,
+            "cached_at": datetime.now(timezone.utc),
+            "expires_at": datetime.now(timezone.utc) + timedelta(hours=1)
+        }
+        await hotel_search_cache.insert_one(db.hotel_cache, search_cache_key(search_request), cache_doc)
+    
+    return hotels
+
+async def search_cache_expiry(key: tuple) -> Optional[float]:
+    destination, check_in, check_out = key
+    return await hotel_search_cache.expires_at(db.hotel_cache, {"destination": destination, "check_in": check_in, "check_out": check_out})
+
+async def warm_search(key: tuple) -> None:
+    """Refetch a popular search into hotel_cache, sharing the call with any identical user search in flight"""
+    destination, check_in, check_out = key
+    search_request = HotelSearchRequest(destination=destination, check_in=check_in, check_out=check_out)
+    await booking_flight.do(search_flight_key(search_request), lambda: fetch_search_results(search_request, CITY_ID_MAPPING[destination]))
+
+def warmable(key: tuple) -> bool:
+    destination, check_in, _ = key
+    return destination in CITY_ID_MAPPING and check_in >= datetime.now(timezone.utc).date().isoformat()
+
+search_warmer = CacheWarmer(
+    search_popularity,
+    search_cache_expiry,
+    warm_search,
+    top_n=int(os.environ.get('CACHE_WARMER_TOP_N', 50)),
+    interval=float(os.environ.get('CACHE_WARMER_INTERVAL', 300)),
+    refresh_ahead=float(os.environ.get('CACHE_WARMER_REFRESH_AHEAD', 600)),
+    concurrency=int(os.environ.get('CACHE_WARMER_CONCURRENCY', 4)),
+    rate=float(os.environ.get('CACHE_WARMER_RATE', 2)),
+    keep=warmable,
+    paused=lambda: booking_breaker.state != "closed",
+)
+
+def search_flight_key(search_request: HotelSearchRequest) -> tuple:
+    """Normalized upstream-relevant part of a search, used to coalesce identical requests"""
+    return (
+        "search",
+        search_request.destination.strip().lower(),
+        search_request.check_in,
+        search_request.check_out,
+        search_request.num_adults,
+        search_request.num_children,
+        search_request.num_rooms,
+    )
+
 @api_router.post("/hotels/search", response_model=List[HotelInfo])
-async def search_hotels(search_request: HotelSearchRequest):
-    """Search for hotels using Booking.com API or mock data"""
+async def search_hotels(search_request: HotelSearchRequest, request: Request, response: Response):
+    """Search for hotels using Booking.com API or mock data.
+
+    With `Accept: application/x-ndjson` matches are streamed one hotel per line
+    as they are filtered; there is no X-Next-Offset, the stream simply ends.
+    """
     
     if USE_REAL_API:
         city_id = CITY_ID_MAPPING.get(search_request.destination.lower())
         
         if not city_id:
-            available_cities = ", ".join(list(CITY_ID_MAPPING.keys())[:10])
+            suggestions = [d.name.lower() for d in destination_index.suggest(search_request.destination, limit=20) if d.supported]
+            available_cities = ", ".join(suggestions[:10] or list(CITY_ID_MAPPING.keys())[:10])
             raise HTTPException(
                 status_code=400,
                 detail=f"City '{search_request.destination}' not supported. Try: {available_cities}"
             )
-        
-        cached = await db.hotel_cache.find_one({
-            "destination": search_request.destination.lower(),
-            "check_in": search_request.check_in,
-            "check_out": search_request.check_out,
-            "expires_at": {"$gt": datetime.now(timezone.utc)}
-        }, {"_id": 0})
-        
-        if cached:
-            logger.info(f"Returning cached results for {search_request.destination}")
-            return [HotelInfo(**h) for h in cached["results"]]
-        
-        payload = {
-            "booker": {
-                "country": "us",
-                "platform": "desktop"
-            },
-            "checkin": search_request.check_in,
-            "checkout": search_request.check_out,
-            "city": city_id,
-            "guests": {
-                "number_of_adults": search_request.num_adults,
-                "number_of_children": search_request.num_children,
-                "number_of_rooms": search_request.num_rooms
-            },
-            "extras": ["products", "extra_charges", "images"]
-        }
+        search_popularity.record(search_cache_key(search_request))
         
         try:
-            response_data = await call_booking_api("accommodations/search", "POST", payload)
-            
-            hotels = []
-            for accommodation in response_data.get("data", [])[:15]:
-                try:
-                    price_data = accommodation.get("price", {})
-                    price = float(price_data.get("total", 0)) if price_data else 0
-                    
-                    hotel = HotelInfo(
-                        id=accommodation.get("id", 0),
-                        name=accommodation.get("name", "Unknown Hotel"),
-                        city=search_request.destination,
-                        country=accommodation.get("country", ""),
-                        description=(accommodation.get("description", "Beautiful hotel")[:200] + "..."),
-                        price=price,
-                        currency=accommodation.get("currency", {}).get("accommodation", "USD"),
-                        rating=float(accommodation.get("review_score", 0)),
-                        review_count=accommodation.get("review_count", 0),
-                        image_urls=accommodation.get("image_urls", [])[:4],
-                        amenities=accommodation.get("facilities", [])[:6]
-                    )
-                    hotels.append(hotel)
-                except Exception as e:
-                    logger.error(f"Error parsing hotel data: {str(e)}")
-                    continue
-            
-            if hotels:
-                cache_doc = {
-                    "destination": search_request.destination.lower(),
-                    "check_in": search_request.check_in,
-                    "check_out": search_request.check_out,
-                    "results": [h.dict() for h in hotels],
-                    "cached_at": datetime.now(timezone.utc),
-                    "expires_at": datetime.now(timezone.utc) + timedelta(hours=1)
-                }
-                await db.hotel_cache.insert_one(cache_doc)
-            
-            return hotels
+            results = await booking_flight.do(
+                search_flight_key(search_request),
+                lambda: load_search_results(search_request, city_id)
+            )
+            sold_out = room_inventory.unavailable(search_request.check_in, search_request.check_out)
+            exclude = {i for i, hotel in enumerate(results) if hotel["id"] in sold_out} if sold_out else ()
+            if wants_ndjson(request):
+                positions = iterate_page(CatalogViews(results), None, search_request, exclude=exclude) if results else iter(())
+                return StreamingResponse(ndjson_lines(encode_hotel(results[i]) for i in positions), media_type=NDJSON_MEDIA_TYPE)
+            page = select_hotels(CatalogViews(results), None, search_request, response, exclude=exclude) if results else []
+            return [HotelInfo(**results[i]) for i in page]
             
         except HTTPException:
             raise
@@ -457,60 +877,170 @@ async def search_hotels(search_request: HotelSearchRequest):
             logger.error(f"Unexpected error calling Booking.com API: {str(e)}")
             logger.info("Falling back to mock data")
     
-    filtered_hotels = [h for h in MOCK_HOTELS if search_request.destination.lower() in h["city"].lower() or search_request.destination.lower() in h["country"].lower()]
+    catalog = hotel_catalog
+    streaming = wants_ndjson(request)
+    sold_out = sorted(catalog.positions[hotel_id] for hotel_id in room_inventory.unavailable(search_request.check_in, search_request.check_out) if hotel_id in catalog)
+    digest = hashlib.sha1(search_request.model_dump_json().encode())
+    if sold_out:
+        digest.update(str(sold_out).encode())  # the same search excludes different hotels as rooms sell out
+    etag = f'W/"{catalog.version}-{digest.hexdigest()[:16]}{"-nd" if streaming else ""}"'
+    cache_headers = {"ETag": etag, "Vary": "Accept", "X-Catalog-Version": catalog.version}
+    if request.method == "GET":
+        # Browsers and shared caches only store GETs; revalidating every time picks up hotels selling out
+        cache_headers["Cache-Control"] = "public, no-cache"
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+    
+    def mock_candidates() -> Optional[List[int]]:
+        candidates = catalog.index.search(search_request.destination)
+        return None if not candidates or len(candidates) == len(catalog) else candidates
+    
+    def mock_page():
+        return select_page(catalog.views, mock_candidates(), search_request, default_sort="recommended", exclude=set(sold_out))
+    
+    if streaming:
+        positions = iterate_page(catalog.views, mock_candidates(), search_request, default_sort="recommended", exclude=set(sold_out))
+        if catalog.payloads is not None:
+            records = (catalog.payloads.hotel(i) for i in positions)
+        else:
+            records = (encode_hotel(catalog.hotels[i]) for i in positions)
+        return StreamingResponse(ndjson_lines(records), media_type=NDJSON_MEDIA_TYPE, headers=cache_headers)
+    
+    if catalog.payloads is not None:
+        body, next_offset = catalog.payloads.result_set(etag, mock_page)
+        set_next_offset(response, next_offset)
+        return PreEncodedJSONResponse(body, headers=dict(response.headers))
+    
+    page, next_offset = mock_page()
+    set_next_offset(response, next_offset)
+    return [HotelInfo(**catalog.hotels[i]) for i in page]
+
+def search_request_from_query(request: Request) -> HotelSearchRequest:
+    """HotelSearchRequest from query parameters, with `amenities` repeated once per amenity"""
+    params = {key: value for key, value in request.query_params.items() if key != "amenities"}
+    try:
+        return HotelSearchRequest(**params, amenities=request.query_params.getlist("amenities"))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+@api_router.get("/hotels/search", response_model=List[HotelInfo])
+async def search_hotels_by_query(request: Request, response: Response, search_request: HotelSearchRequest = Depends(search_request_from_query)):
+    """The search as a GET with query parameters, so mock-catalog results can be cached and revalidated with If-None-Match"""
+    return await search_hotels(search_request, request, response)
+
+class DestinationSuggestion(BaseModel):
+    name: str
+    country: Optional[str] = None
+    kind: Literal["city", "country"]
+    hotel_count: int
+    supported: bool
+
+@api_router.get("/destinations/suggest", response_model=List[DestinationSuggestion])
+async def suggest_destinations(response: Response, q: str = Query("", max_length=100), limit: int = Query(8, ge=1, le=20)):
+    """Destination autocomplete; `supported` cities can be searched on Booking.com"""
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return [DestinationSuggestion(**destination._asdict()) for destination in destination_index.suggest(q, limit)]
+
+async def fetch_hotel_details(hotel_id: int) -> Dict:
+    """Fetch and parse Booking.com details for a hotel into a hotel_details_cache document"""
+    response_data = await call_booking_api(f"accommodations/{hotel_id}")
+    
+    accommodation = response_data.get("data", {})
     
-    if not filtered_hotels:
-        filtered_hotels = MOCK_HOTELS
+    price_data = accommodation.get("price", {})
+    price = float(price_data.get("total", 0)) if price_data else 0
     
-    random.shuffle(filtered_hotels)
+    hotel = HotelInfo(
+        id=accommodation.get("id", hotel_id),
+        name=accommodation.get("name", "Unknown Hotel"),
+        city=accommodation.get("city", ""),
+        country=accommodation.get("country", ""),
+        description=accommodation.get("description", ""),
+        price=price,
+        currency=accommodation.get("currency", {}).get("accommodation", "USD"),
+        rating=float(accommodation.get("review_score", 0)),
+        review_count=accommodation.get("review_count", 0),
+        image_urls=accommodation.get("image_urls", []),
+        amenities=accommodation.get("facilities", [])
+    )
     
-    return [HotelInfo(**hotel) for hotel in filtered_hotels]
+    return {
+        "hotel_id": hotel_id,
+        "hotel_data": hotel.dict(),
+        "cached_at": datetime.now(timezone.utc),
+        "expires_at": datetime.now(timezone.utc) + timedelta(hours=6)
+    }
+
+async def refresh_hotel_details(hotel_id: int) -> Dict:
+    cache_doc = await fetch_hotel_details(hotel_id)
+    await hotel_details_cache.insert_one(db.hotel_details_cache, hotel_id, cache_doc)
+    return cache_doc["hotel_data"]
+
+async def load_hotel_details(hotel_id: int) -> Dict:
+    """Cached or freshly fetched Booking.com details for a hotel, as a HotelInfo dict; stale entries are refreshed in the background"""
+    cached = await hotel_details_cache.lookup(db.hotel_details_cache, hotel_id, {"hotel_id": hotel_id})
+    
+    if cached:
+        if is_fresh(cached):
+            logger.info(f"Returning cached details for hotel {hotel_id}")
+        else:
+            cache_revalidator.schedule(("details", hotel_id), lambda: refresh_hotel_details(hotel_id))
+        return cached["hotel_data"]
+    
+    return await refresh_hotel_details(hotel_id)
+
+async def load_hotel_details_batch(hotel_ids: List[int]) -> Dict[int, Dict]:
+    """load_hotel_details for many hotels: one cache query, bounded concurrent fetches, one write.
+
+    Each miss goes through booking_flight under the same key as
+    /hotels/{hotel_id}, so the two never fetch the same hotel twice at once.
+    Hotels Booking.com doesn't know (404) or that failed to load are left out
+    of the result; an error is raised only if no hotel could be returned.
+    """
+    cached = await hotel_details_cache.find_many(db.hotel_details_cache, "hotel_id", hotel_ids)
+    found = {hotel_id: doc["hotel_data"] for hotel_id, doc in cached.items()}
+    for hotel_id, doc in cached.items():
+        if not is_fresh(doc):
+            cache_revalidator.schedule(("details", hotel_id), lambda hotel_id=hotel_id: refresh_hotel_details(hotel_id))
+    misses = [hotel_id for hotel_id in hotel_ids if hotel_id not in cached]
+    if not misses:
+        return found
+    
+    semaphore = asyncio.Semaphore(HOTEL_BATCH_CONCURRENCY)
+    fetched: Dict[int, Dict] = {}
+    
+    async def fetch(hotel_id: int) -> Dict:
+        async with semaphore:
+            cache_doc = await fetch_hotel_details(hotel_id)
+        fetched[hotel_id] = cache_doc
+        return cache_doc["hotel_data"]
+    
+    results = await asyncio.gather(
+        *(booking_flight.do(("details", hotel_id), lambda hotel_id=hotel_id: fetch(hotel_id)) for hotel_id in misses),
+        return_exceptions=True
+    )
+    await hotel_details_cache.insert_many(db.hotel_details_cache, fetched)
+    
+    errors = []
+    for hotel_id, result in zip(misses, results):
+        if isinstance(result, dict):
+            found[hotel_id] = result
+        elif not (isinstance(result, HTTPException) and result.status_code == 404):
+            logger.error(f"Failed to load details for hotel {hotel_id}: {result!r}")
+            errors.append(result)
+    if errors and not found:
+        raise errors[0]
+    return found
 
 @api_router.get("/hotels/{hotel_id}", response_model=HotelInfo)
 async def get_hotel_details(hotel_id: int):
     """Get detailed hotel information from Booking.com or mock data"""
     
     if USE_REAL_API:
-        cached = await db.hotel_details_cache.find_one({
-            "hotel_id": hotel_id,
-            "expires_at": {"$gt": datetime.now(timezone.utc)}
-        }, {"_id": 0})
-        
-        if cached:
-            logger.info(f"Returning cached details for hotel {hotel_id}")
-            return HotelInfo(**cached["hotel_data"])
-        
         try:
-            response_data = await call_booking_api(f"accommodations/{hotel_id}")
-            
-            accommodation = response_data.get("data", {})
-            
-            price_data = accommodation.get("price", {})
-            price = float(price_data.get("total", 0)) if price_data else 0
-            
-            hotel = HotelInfo(
-                id=accommodation.get("id", hotel_id),
-                name=accommodation.get("name", "Unknown Hotel"),
-                city=accommodation.get("city", ""),
-                country=accommodation.get("country", ""),
-                description=accommodation.get("description", ""),
-                price=price,
-                currency=accommodation.get("currency", {}).get("accommodation", "USD"),
-                rating=float(accommodation.get("review_score", 0)),
-                review_count=accommodation.get("review_count", 0),
-                image_urls=accommodation.get("image_urls", []),
-                amenities=accommodation.get("facilities", [])
-            )
-            
-            cache_doc = {
-                "hotel_id": hotel_id,
-                "hotel_data": hotel.dict(),
-                "cached_at": datetime.now(timezone.utc),
-                "expires_at": datetime.now(timezone.utc) + timedelta(hours=6)
-            }
-            await db.hotel_details_cache.insert_one(cache_doc)
-            
-            return hotel
+            hotel_data = await booking_flight.do(("details", hotel_id), lambda: load_hotel_details(hotel_id))
+            return HotelInfo(**hotel_data)
             
         except HTTPException as e:
             if e.status_code == 404:
@@ -518,44 +1048,76 @@ async def get_hotel_details(hotel_id: int):
             else:
                 raise
     
-    hotel = next((h for h in MOCK_HOTELS if h["id"] == hotel_id), None)
-    if not hotel:
+    catalog = hotel_catalog
+    position = catalog.position(hotel_id)
+    if position is None:
         raise HTTPException(status_code=404, detail="Hotel not found")
-    return HotelInfo(**hotel)
+    if catalog.payloads is not None:
+        return PreEncodedJSONResponse(catalog.payloads.hotel(position))
+    return HotelInfo(**catalog.hotels[position])
+
+class HotelBatchRequest(BaseModel):
+    hotel_ids: List[int] = Field(..., min_length=1, max_length=HOTEL_BATCH_MAX_IDS)
+
+@api_router.post("/hotels/batch", response_model=List[HotelInfo])
+async def get_hotel_details_batch(batch_request: HotelBatchRequest):
+    """Details for several hotels at once, in request order; unknown ids are omitted"""
+    hotel_ids = list(dict.fromkeys(batch_request.hotel_ids))
+    found: Dict[int, Dict] = {}
+    
+    if USE_REAL_API:
+        found = await load_hotel_details_batch(hotel_ids)
+        missing = [hotel_id for hotel_id in hotel_ids if hotel_id not in found]
+        if missing:
+            logger.info(f"Hotels {missing} not found on Booking.com, using mock data")
+    
+    catalog = hotel_catalog
+    if not found and catalog.payloads is not None:
+        positions = [catalog.positions[hotel_id] for hotel_id in hotel_ids if hotel_id in catalog.positions]
+        return PreEncodedJSONResponse(catalog.payloads.array(positions))
+    mock = catalog.get_many(hotel_id for hotel_id in hotel_ids if hotel_id not in found)
+    return [HotelInfo(**(found.get(hotel_id) or mock[hotel_id])) for hotel_id in hotel_ids if hotel_id in found or hotel_id in mock]
+
+async def in_transaction(fn):
+    """Run fn(session) in a Mongo transaction when MONGO_TRANSACTIONS is on (needs a replica set), else fn(None)"""
+    if not MONGO_TRANSACTIONS:
+        return await fn(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(fn)
+
+async def upsert_guest_user(booking_request: BookingRequest, session=None) -> str:
+    """user_id of the user with the guest's email, creating a guest user in the same round-trip if none exists"""
+    guest_doc = {
+        "user_id": f"guest_{uuid.uuid4().hex[:12]}",
+        "name": f"{booking_request.guest_first_name} {booking_request.guest_last_name}",
+        "picture": "",  # No picture for guests
+        "created_at": datetime.now(timezone.utc),
+        "is_guest": True
+    }
+    guest_user = await db.users.find_one_and_update(
+        {"email": booking_request.guest_email},
+        {"$setOnInsert": guest_doc},
+        projection={"_id": 0, "user_id": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    return guest_user["user_id"]
 
 @api_router.post("/bookings/create", response_model=BookingResponse)
 async def create_booking(booking_request: BookingRequest, user: Optional[Dict] = Depends(get_current_user)):
-    # If no authenticated user, try to find or create a guest user based on email
-    user_id = None
-    if user:
-        user_id = user["user_id"]
-    else:
-        # Check if guest email exists in users
-        guest_user = await db.users.find_one({"email": booking_request.guest_email}, {"_id": 0})
-        if guest_user:
-            user_id = guest_user["user_id"]
-        else:
-            # Create a new guest user
-            user_id = f"guest_{uuid.uuid4().hex[:12]}"
-            guest_doc = {
-                "user_id": user_id,
-                "email": booking_request.guest_email,
-                "name": f"{booking_request.guest_first_name} {booking_request.guest_last_name}",
-                "picture": "",  # No picture for guests
-                "created_at": datetime.now(timezone.utc),
-                "is_guest": True
-            }
-            await db.users.insert_one(guest_doc)
-
-    hotel = next((h for h in MOCK_HOTELS if h["id"] == booking_request.hotel_id), None)
+    hotel = hotel_catalog.get(booking_request.hotel_id)
     if not hotel:
         raise HTTPException(status_code=404, detail="Hotel not found")
+    try:
+        nights = stay_nights(booking_request.check_in, booking_request.check_out)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     booking_id = f"booking_{uuid.uuid4().hex[:12]}"
     
     booking_doc = {
         "booking_id": booking_id,
-        "user_id": user_id,
         "hotel_id": booking_request.hotel_id,
         "hotel_name": hotel["name"],
         "check_in": booking_request.check_in,
@@ -565,12 +1127,31 @@ async def create_booking(booking_request: BookingRequest, user: Optional[Dict] =
         "guest_email": booking_request.guest_email,
         "num_adults": booking_request.num_adults,
         "num_children": booking_request.num_children,
+        "num_rooms": booking_request.num_rooms,
         "total_price": booking_request.total_price,
         "status": "confirmed",
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.bookings.insert_one(booking_doc)
+    async def write_booking(session):
+        if not await room_inventory.reserve(db.room_inventory, booking_request.hotel_id, nights, booking_request.num_rooms, session):
+            raise HTTPException(status_code=409, detail="Not enough rooms left for the selected dates")
+        try:
+            # If no authenticated user, attach the booking to a (possibly new) guest user by email
+            booking_doc["user_id"] = user["user_id"] if user else await upsert_guest_user(booking_request, session)
+            await db.bookings.insert_one(dict(booking_doc), session=session)
+        except Exception:
+            if session is None:  # a transaction rolls the reservation back itself
+                await room_inventory.release(db.room_inventory, booking_request.hotel_id, nights, booking_request.num_rooms)
+            raise
+    
+    try:
+        await in_transaction(write_booking)
+    except DuplicateKeyError:
+        # A concurrent booking created the same guest between our match and insert; it matches now
+        await in_transaction(write_booking)
+    if MONGO_TRANSACTIONS:
+        await room_inventory.sync(db.room_inventory, booking_request.hotel_id, nights)
     
     return BookingResponse(
         booking_id=booking_id,
@@ -583,10 +1164,62 @@ async def create_booking(booking_request: BookingRequest, user: Optional[Dict] =
         created_at=booking_doc["created_at"]
     )
 
+BOOKING_PROJECTION = {"_id": 0, **{field: 1 for field in BookingResponse.model_fields}}
+
+def encode_booking_cursor(booking: Dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps([booking["created_at"], booking["booking_id"]]).encode()).decode()
+
+def decode_booking_cursor(cursor: str) -> List[str]:
+    try:
+        created_at, booking_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [str(created_at), str(booking_id)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @api_router.get("/bookings", response_model=List[BookingResponse])
-async def get_user_bookings(user: Dict = Depends(get_current_user)):
-    bookings = await db.bookings.find({"user_id": user["user_id"]}, {"_id": 0}).to_list(100)
-    return [BookingResponse(**booking) for booking in bookings]
+async def get_user_bookings(
+    request: Request,
+    response: Response,
+    user: Dict = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    from_date: Optional[str] = Query(None, description="Earliest check-in date (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, description="Latest check-in date (YYYY-MM-DD)")
+):
+    """Newest-first booking history, keyset-paginated on (created_at, booking_id).
+
+    The next page's cursor is returned in X-Next-Cursor. With
+    `Accept: application/x-ndjson` the whole matching history is streamed instead.
+    """
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    query: Dict[str, Any] = {"user_id": user["user_id"]}
+    if status:
+        query["status"] = status
+    if from_date or to_date:
+        query["check_in"] = {**({"$gte": from_date} if from_date else {}), **({"$lte": to_date} if to_date else {})}
+    if cursor:
+        created_at, booking_id = decode_booking_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "booking_id": {"$lt": booking_id}}
+        ]
+    
+    bookings = db.bookings.find(query, BOOKING_PROJECTION).sort([("created_at", -1), ("booking_id", -1)])
+    
+    if wants_ndjson(request):
+        async def stream():
+            async for booking in bookings:
+                yield BookingResponse(**booking).model_dump_json().encode() + b"\n"
+        return StreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE)
+    
+    page = await bookings.limit(limit + 1).to_list(limit + 1)
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = encode_booking_cursor(page[-1])
+    return [BookingResponse(**booking) for booking in page]
 
 
 # Validates Stripe Checkout Session Request
@@ -642,32 +1275,72 @@ async def create_checkout_session(payment_req: PaymentCheckoutRequest, user: Dic
     
     return CheckoutSessionResponse(session_id=session_id, url=success_url)
 
+async def confirm_booking(booking_id: str) -> None:
+    await db.bookings.update_one({"booking_id": booking_id, "status": {"$ne": "confirmed"}}, {"$set": {"status": "confirmed"}})
+
 @api_router.get("/payments/checkout/status/{session_id}", response_model=CheckoutStatusResponse)
-async def get_checkout_status(session_id: str, user: Dict = Depends(get_current_user)):
-    # Mock implementation - always return paid
-    payment_doc = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0})
+async def get_checkout_status(session_id: str, background_tasks: BackgroundTasks, user: Dict = Depends(get_current_user)):
+    """Payment status for a checkout session; settled sessions are answered from memory"""
+    settled = settled_checkouts.get(session_id)
+    if settled:
+        return settled
     
+    # Mock implementation - a pending payment completes on its first poll. Only that
+    # poll matches and writes; the booking is confirmed after the response is sent.
+    payment_doc = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id, "payment_status": "pending"},
+        {"$set": {"payment_status": "paid", "status": "completed"}},
+        projection={"_id": 0, "booking_id": 1}
+    )
     if payment_doc:
-        # Auto-complete the payment
-        await db.payment_transactions.update_one(
-            {"session_id": session_id},
-            {"$set": {"payment_status": "paid", "status": "completed"}}
-        )
-        await db.bookings.update_one(
-            {"booking_id": payment_doc["booking_id"]},
-            {"$set": {"status": "confirmed"}}
-        )
-        return CheckoutStatusResponse(session_id=session_id, payment_status="paid", status="complete")
-        
-    return CheckoutStatusResponse(session_id=session_id, payment_status="unknown", status="unknown")
+        background_tasks.add_task(confirm_booking, payment_doc["booking_id"])
+        payment_doc["payment_status"] = "paid"
+    else:
+        payment_doc = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0, "payment_status": 1, "status": 1})
+    
+    if not payment_doc:
+        return CheckoutStatusResponse(session_id=session_id, payment_status="unknown", status="unknown")
+    if payment_doc["payment_status"] != "paid":
+        return CheckoutStatusResponse(session_id=session_id, payment_status=payment_doc["payment_status"], status=payment_doc.get("status", "open"))
+    
+    settled = CheckoutStatusResponse(session_id=session_id, payment_status="paid", status="complete")
+    settled_checkouts.set(session_id, settled, time.time() + CHECKOUT_STATUS_CACHE_TTL)
+    return settled
 
 @api_router.post("/webhook/stripe")
-async def stripe_webhook(request: Request):
-    # Mock webhook - do nothing or just return success
-    return {"status": "success"}
+async def stripe_webhook(request: Request, stripe_signature: Optional[str] = Header(None)):
+    """Verify a Stripe event and queue it; payment and booking updates are written in batches by the webhook worker.
+
+    Without STRIPE_WEBHOOK_SECRET events can't be authenticated, so they are refused with 503,
+    which Stripe retries for days, rather than acknowledged and lost.
+    """
+    if not STRIPE_WEBHOOK_SECRET:
+        logger.error("Refusing Stripe webhook: STRIPE_WEBHOOK_SECRET is not set")
+        raise HTTPException(status_code=503, detail="Webhook signing secret not configured", headers={"Retry-After": "3600"})
+    payload = await request.body()
+    try:
+        verify_signature(payload, stripe_signature, STRIPE_WEBHOOK_SECRET)
+    except WebhookSignatureError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        event = json.loads(payload)
+        if not isinstance(event.get("id"), str) or not isinstance(event.get("type"), str):
+            raise ValueError("event id and type are required")
+        if event["type"] in PAYMENT_EVENTS and not isinstance(event["data"]["object"]["id"], str):
+            raise ValueError("checkout session id is required")
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid webhook payload: {str(e)}")
+    
+    try:
+        queued = webhook_pipeline.submit(event)
+    except asyncio.QueueFull:
+        # Stripe retries failed deliveries, so shed load instead of blocking
+        raise HTTPException(status_code=503, detail="Webhook queue is full", headers={"Retry-After": "5"})
+    return {"status": "success", "duplicate": not queued}
 
 
-app.include_router(api_router, prefix="/api")
+app.include_router(api_router, prefix="/api", dependencies=[Depends(enforce_rate_limit)])
 
 
 # CORS configuration
@@ -687,7 +1360,9 @@ app.add_middleware(
     allow_credentials=False,  # Not needed since we removed login
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Offset", "X-Next-Cursor", "ETag", "X-Catalog-Version"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
 logging.basicConfig(
@@ -0,0 +1,130 @@
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from metrics import UPSTREAM_REQUEST_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class UpstreamClient:
+    """One long-lived, pooled httpx.AsyncClient per upstream service.
+
+    Reusing the client keeps TCP/TLS connections alive between requests instead
+    of handshaking on every call. Limits and timeouts come from
+    `<PREFIX>_HTTP_*` environment variables, so each upstream is tuned
+    separately. The client is opened in the app lifespan; if a request arrives
+    before that (e.g. in scripts), it is opened lazily.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        env_prefix: str,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+    ):
+        self.name = name
+        self.timeout = httpx.Timeout(
+            _env_float(f"{env_prefix}_HTTP_TIMEOUT", timeout),
+            connect=_env_float(f"{env_prefix}_HTTP_CONNECT_TIMEOUT", connect_timeout),
+        )
+        self.limits = httpx.Limits(
+            max_connections=_env_int(f"{env_prefix}_HTTP_MAX_CONNECTIONS", max_connections),
+            max_keepalive_connections=_env_int(f"{env_prefix}_HTTP_MAX_KEEPALIVE", max_keepalive_connections),
+            keepalive_expiry=_env_float(f"{env_prefix}_HTTP_KEEPALIVE_EXPIRY", keepalive_expiry),
+        )
+        self.http2 = os.environ.get(f"{env_prefix}_HTTP2", str(http2)).lower() in ("1", "true", "yes")
+        if self.http2 and not _http2_available():
+            logger.warning(f"{env_prefix}_HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1 for {name}")
+            self.http2 = False
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=self.http2)
+        return self._client
+
+    async def start(self) -> None:
+        self.client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests += 1
+        started = time.perf_counter()
+        status: Any = "error"
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+            return response
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight -= 1
+            self.total_seconds += elapsed
+            UPSTREAM_REQUEST_DURATION.observe(elapsed, self.name, method, status)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _open_connections(self) -> Optional[int]:
+        # httpx doesn't expose pool state publicly; read it defensively
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return None if connections is None else len(connections)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "connections": self._open_connections(),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "utilisation": self.in_flight / self.limits.max_connections if self.limits.max_connections else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_seconds / self.requests * 1000, 2) if self.requests else None,
+        }
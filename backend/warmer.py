@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import logging
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityTracker:
+    """Exponentially decayed request counts per key.
+
+    A hit is worth 1 now and half that after `half_life` seconds, so the top
+    keys follow what is searched lately rather than all-time. Scores are kept
+    on a log scale relative to a fixed origin, which makes a hit O(1) with no
+    periodic decay pass. Beyond `maxsize` keys the least popular half is dropped.
+    """
+
+    def __init__(self, half_life: float = 3600.0, maxsize: int = 10000):
+        self.rate = math.log(2) / half_life
+        self.maxsize = maxsize
+        self._origin = time.time()
+        self._scores: Dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def record(self, key: Hashable) -> None:
+        weight = self.rate * (time.time() - self._origin)
+        score = self._scores.get(key)
+        # log(e^score + e^weight) without overflow
+        self._scores[key] = weight if score is None else max(score, weight) + math.log1p(math.exp(-abs(score - weight)))
+        if len(self._scores) > self.maxsize:
+            keep = heapq.nlargest(self.maxsize // 2, self._scores.items(), key=lambda item: item[1])
+            self._scores = dict(keep)
+
+    def score(self, key: Hashable) -> float:
+        """Current decayed hit count for `key`"""
+        score = self._scores.get(key)
+        return 0.0 if score is None else math.exp(score - self.rate * (time.time() - self._origin))
+
+    def top(self, n: int, keep: Callable[[Hashable], bool] = lambda key: True) -> List[Hashable]:
+        """The `n` most popular keys for which `keep(key)` is true; others are forgotten"""
+        for key in [key for key in self._scores if not keep(key)]:
+            del self._scores[key]
+        return heapq.nlargest(n, self._scores, key=self._scores.__getitem__)
+
+
+class CacheWarmer:
+    """Refreshes the most popular cache keys shortly before they expire.
+
+    Every `interval` seconds (with jitter, so workers don't line up) the top
+    `top_n` keys are checked with `expires_at(key)`; those missing or expiring
+    within `refresh_ahead` seconds are passed to `refresh(key)`, at most
+    `concurrency` at a time and no more than `rate` starts per second. A round
+    is skipped while `paused()` is true, e.g. when the upstream circuit is open.
+    """
+
+    def __init__(
+        self,
+        tracker: PopularityTracker,
+        expires_at: Callable[[Hashable], Awaitable[Optional[float]]],
+        refresh: Callable[[Hashable], Awaitable[Any]],
+        top_n: int = 50,
+        interval: float = 300.0,
+        refresh_ahead: float = 600.0,
+        concurrency: int = 4,
+        rate: float = 2.0,
+        keep: Callable[[Hashable], bool] = lambda key: True,
+        paused: Callable[[], bool] = lambda: False,
+    ):
+        self.tracker = tracker
+        self.expires_at, self.refresh = expires_at, refresh
+        self.top_n, self.interval, self.refresh_ahead = top_n, interval, refresh_ahead
+        self.concurrency, self.rate = concurrency, rate
+        self.keep, self.paused = keep, paused
+        self._next_start = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.fresh = 0
+        self.last_round_seconds: Optional[float] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval * random.uniform(0.8, 1.2))
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Cache warmer round failed: {str(e)}")
+
+    async def _pace(self) -> None:
+        """Wait for the next upstream start slot allowed by `rate`"""
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + 1 / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def run_once(self) -> Tuple[int, int]:
+        """One warming round; returns (keys refreshed, keys that failed)"""
+        if self.paused():
+            return 0, 0
+        started = time.monotonic()
+        self.rounds += 1
+        semaphore = asyncio.Semaphore(self.concurrency)
+        refreshed = failed = 0
+
+        async def warm(key: Hashable) -> None:
+            nonlocal refreshed, failed
+            async with semaphore:
+                expires_at = await self.expires_at(key)
+                if expires_at is not None and expires_at - time.time() > self.refresh_ahead:
+                    self.fresh += 1
+                    return
+                if self.paused():
+                    return
+                await self._pace()
+                try:
+                    await self.refresh(key)
+                    refreshed += 1
+                except Exception as e:
+                    failed += 1
+                    logger.warning(f"Cache warmer could not refresh {key}: {e!r}")
+
+        await asyncio.gather(*(warm(key) for key in self.tracker.top(self.top_n, self.keep)))
+        self.refreshed += refreshed
+        self.failed += failed
+        self.last_round_seconds = round(time.monotonic() - started, 3)
+        if refreshed or failed:
+            logger.info(f"Cache warmer refreshed {refreshed} keys ({failed} failed) in {self.last_round_seconds}s")
+        return refreshed, failed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "tracked_keys": len(self.tracker),
+            "rounds": self.rounds,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "already_fresh": self.fresh,
+            "last_round_seconds": self.last_round_seconds,
+        }
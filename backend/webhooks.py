@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_TOLERANCE = 300
+
+# Stripe event type -> ($set applied to the pending payment, booking status to set or None)
+PAYMENT_EVENTS: Dict[str, Tuple[Dict[str, str], Optional[str]]] = {
+    "checkout.session.completed": ({"payment_status": "paid", "status": "completed"}, "confirmed"),
+    "checkout.session.async_payment_succeeded": ({"payment_status": "paid", "status": "completed"}, "confirmed"),
+    "checkout.session.async_payment_failed": ({"payment_status": "failed", "status": "failed"}, None),
+    "checkout.session.expired": ({"payment_status": "expired", "status": "expired"}, None),
+}
+
+
+def settles_payment(event: Dict[str, Any]) -> bool:
+    """Whether an event in PAYMENT_EVENTS moves the payment; checkout.session.completed only once it is paid"""
+    if event["type"] == "checkout.session.completed":
+        return event["data"]["object"].get("payment_status") == "paid"
+    return True
+
+
+class WebhookSignatureError(ValueError):
+    pass
+
+
+def signature_header(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """A Stripe-Signature header value for a payload, as Stripe computes it"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def verify_signature(payload: bytes, header: Optional[str], secret: str, tolerance: int = SIGNATURE_TOLERANCE) -> None:
+    """Check a Stripe-Signature header (t=...,v1=...) against the raw request body"""
+    if not header:
+        raise WebhookSignatureError("Missing Stripe-Signature header")
+    parts = [part.split("=", 1) for part in header.split(",") if "=" in part]
+    timestamps = [value for key, value in parts if key == "t"]
+    signatures = [value for key, value in parts if key == "v1"]
+    if not timestamps or not signatures or not timestamps[0].isdigit():
+        raise WebhookSignatureError("Malformed Stripe-Signature header")
+    if abs(time.time() - int(timestamps[0])) > tolerance:
+        raise WebhookSignatureError("Stripe-Signature timestamp outside the tolerance window")
+    expected = signature_header(payload, secret, int(timestamps[0])).split("v1=", 1)[1]
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise WebhookSignatureError("Stripe-Signature does not match the payload")
+
+
+class WebhookPipeline:
+    """Queue between the webhook endpoint and batched Mongo writes.
+
+    `submit` drops event ids this process has already queued or applied and
+    enqueues the rest without touching the database. An id only counts as
+    applied once its batch succeeds, so a redelivery of an event that was
+    given up on or dropped is processed again. A single worker drains the queue in
+    batches: it skips events already recorded in `webhook_events` (by any
+    worker), applies the remainder with one `bulk_write` per collection, then
+    records them. Updates are conditional, so applying an event twice is
+    harmless. A batch that fails is requeued up to `max_attempts` times; if
+    the queue has filled up meanwhile, the events are dropped and left for
+    Stripe to redeliver.
+    """
+
+    def __init__(self, queue_size: int = 10000, batch_size: int = 200, max_attempts: int = 3, seen_size: int = 100000):
+        self.queue: "asyncio.Queue[Tuple[Dict[str, Any], int]]" = asyncio.Queue(queue_size)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.seen = TTLCache(seen_size)
+        self._pending: Set[str] = set()
+        self._worker: Optional[asyncio.Task] = None
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Enqueue an event; False if it's a duplicate. Raises asyncio.QueueFull when backed up."""
+        self.received += 1
+        if event["id"] in self._pending or self.seen.get(event["id"]):
+            self.duplicates += 1
+            return False
+        self.queue.put_nowait((event, 1))
+        self._pending.add(event["id"])
+        return True
+
+    def _settle(self, events: Iterable[Dict[str, Any]], applied: bool) -> None:
+        for event in events:
+            self._pending.discard(event["id"])
+            if applied:
+                self.seen.set(event["id"], True, time.time() + 86400)
+
+    def start(self, db) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run(db))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Give queued events up to `timeout` seconds to be written, then stop the worker"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping webhook worker with {self.queue.qsize()} events still queued")
+        self._worker.cancel()
+        self._worker = None
+
+    async def _run(self, db) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self.apply([event for event, _ in batch], db)
+                self._settle((event for event, _ in batch), applied=True)
+            except Exception as e:
+                logger.error(f"Failed to apply {len(batch)} webhook events: {str(e)}")
+                retry = [(event, attempt + 1) for event, attempt in batch if attempt < self.max_attempts]
+                self.failed += len(batch) - len(retry)
+                self._settle((event for event, attempt in batch if attempt >= self.max_attempts), applied=False)
+                await asyncio.sleep(0.5)
+                for item in retry:
+                    try:
+                        self.queue.put_nowait(item)
+                    except asyncio.QueueFull:
+                        self.dropped += 1
+                        self._settle([item[0]], applied=False)
+                        logger.warning(f"Webhook queue full, dropping event {item[0]['id']} for Stripe to redeliver")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def apply(self, events: List[Dict[str, Any]], db) -> None:
+        """Apply a batch of events to payment_transactions and bookings"""
+        events = list({event["id"]: event for event in events}.values())
+        recorded = {doc["event_id"] async for doc in db.webhook_events.find({"event_id": {"$in": [e["id"] for e in events]}}, {"_id": 0, "event_id": 1})}
+        self.duplicates += len(recorded)
+        events = [event for event in events if event["id"] not in recorded]
+        if not events:
+            return
+
+        # A completed session may still be awaiting an async payment; that one settles with its own event
+        events_to_apply = [event for event in events if event["type"] in PAYMENT_EVENTS and settles_payment(event)]
+        session_ids = {event["data"]["object"]["id"] for event in events_to_apply}
+        booking_ids = {}
+        if session_ids:
+            async for payment in db.payment_transactions.find({"session_id": {"$in": list(session_ids)}}, {"_id": 0, "session_id": 1, "booking_id": 1}):
+                booking_ids[payment["session_id"]] = payment["booking_id"]
+
+        payment_ops, booking_ops = [], []
+        for event in events_to_apply:
+            payment_set, booking_status = PAYMENT_EVENTS[event["type"]]
+            session_id = event["data"]["object"]["id"]
+            # A paid payment never moves again; anything else may still settle
+            payment_ops.append(UpdateOne({"session_id": session_id, "payment_status": {"$ne": "paid"}}, {"$set": payment_set}))
+            if booking_status and session_id in booking_ids:
+                booking_ops.append(UpdateOne({"booking_id": booking_ids[session_id], "status": {"$ne": booking_status}}, {"$set": {"status": booking_status}}))
+
+        if payment_ops:
+            await db.payment_transactions.bulk_write(payment_ops, ordered=False)
+        if booking_ops:
+            await db.bookings.bulk_write(booking_ops, ordered=False)
+
+        now = datetime.now(timezone.utc)
+        try:
+            await db.webhook_events.insert_many([{"event_id": e["id"], "type": e["type"], "received_at": now} for e in events], ordered=False)
+        except BulkWriteError:
+            pass  # recorded concurrently by another worker
+        self.processed += len(events)
+        self.batches += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queue.qsize(),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
@@ -15,7 +15,7 @@ const POPULAR_DESTINATIONS = [
 
 function HeroSection() {
   const navigate = useNavigate();
-  const { searchParams, setSearchParams, setHotels, setLoading, setError } = useHotelStore();
+  const { searchParams, setSearchParams, setHotels, setLoading, setError, getCachedSearch, cacheSearch } = useHotelStore();
   const [showSuggestions, setShowSuggestions] = useState(false);
   const [filteredSuggestions, setFilteredSuggestions] = useState([]);
   const destinationRef = useRef(null);
@@ -85,14 +85,21 @@ function HeroSection() {
     try {
       setLoading(true);
       setError(null);
-      const results = await hotelService.searchHotels({
+      const request = {
         destination: searchParams.destination,
         check_in: searchParams.checkIn,
         check_out: searchParams.checkOut,
         num_adults: searchParams.numAdults,
         num_children: searchParams.numChildren,
         num_rooms: searchParams.numRooms
-      });
+      };
+      const cacheKey = JSON.stringify(request);
+      let results = getCachedSearch(cacheKey);
+      if (!results) {
+        const { hotels, catalogVersion } = await hotelService.searchHotels(request);
+        cacheSearch(cacheKey, hotels, catalogVersion);
+        results = hotels;
+      }
       setHotels(results);
       navigate('/search-results');
     } catch (error) {
@@ -57,14 +57,25 @@ export const authService = {
 };
 
 export const hotelService = {
+  // GET so the browser can revalidate with the ETag; X-Catalog-Version is only sent for mock-catalog results
   searchHotels: async (searchParams) => {
-    const response = await apiClient.post('/hotels/search', searchParams);
-    return response.data;
+    const response = await apiClient.get('/hotels/search', { params: searchParams });
+    return { hotels: response.data, catalogVersion: response.headers['x-catalog-version'] };
   },
   
   getHotelDetails: async (hotelId) => {
     const response = await apiClient.get(`/hotels/${hotelId}`);
     return response.data;
+  },
+
+  getHotelsBatch: async (hotelIds) => {
+    const response = await apiClient.post('/hotels/batch', { hotel_ids: hotelIds });
+    return response.data;
+  },
+
+  suggestDestinations: async (query, limit = 8) => {
+    const response = await apiClient.get('/destinations/suggest', { params: { q: query, limit } });
+    return response.data;
   }
 };
 
@@ -75,8 +86,15 @@ export const bookingService = {
   },
   
   getUserBookings: async () => {
-    const response = await apiClient.get('/bookings');
-    return response.data;
+    // Booking history is paginated; follow X-Next-Cursor until the last page
+    const bookings = [];
+    let cursor = null;
+    do {
+      const response = await apiClient.get('/bookings', { params: cursor ? { cursor } : {} });
+      bookings.push(...response.data);
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return bookings;
   }
 };
 
@@ -1,6 +1,10 @@
 import { create } from 'zustand';
 
-export const useHotelStore = create((set) => ({
+// Mock-catalog search responses are reused for a short while, and only while the catalog version is unchanged
+const SEARCH_CACHE_TTL_MS = 60 * 1000;
+const SEARCH_CACHE_MAX_ENTRIES = 20;
+
+export const useHotelStore = create((set, get) => ({
   searchParams: {
     destination: '',
     checkIn: '',
@@ -14,6 +18,8 @@ export const useHotelStore = create((set) => ({
   selectedHotel: null,
   isLoading: false,
   error: null,
+  searchCache: {},
+  catalogVersion: null,
   
   setSearchParams: (params) => set((state) => ({
     searchParams: { ...state.searchParams, ...params }
@@ -21,6 +27,28 @@ export const useHotelStore = create((set) => ({
   
   setHotels: (hotels) => set({ hotels }),
   
+  getCachedSearch: (key) => {
+    const { searchCache, catalogVersion } = get();
+    const entry = searchCache[key];
+    if (!entry || !catalogVersion || entry.version !== catalogVersion || Date.now() - entry.storedAt > SEARCH_CACHE_TTL_MS) {
+      return null;
+    }
+    return entry.hotels;
+  },
+  
+  // Responses without a catalog version (Booking.com results) are not cached, and drop what was
+  cacheSearch: (key, hotels, version) => set((state) => {
+    if (!version) {
+      return { searchCache: {}, catalogVersion: null };
+    }
+    const searchCache = version === state.catalogVersion ? { ...state.searchCache } : {};
+    delete searchCache[key];
+    searchCache[key] = { hotels, version, storedAt: Date.now() };
+    const keys = Object.keys(searchCache);
+    keys.slice(0, Math.max(0, keys.length - SEARCH_CACHE_MAX_ENTRIES)).forEach((oldest) => delete searchCache[oldest]);
+    return { searchCache, catalogVersion: version };
+  }),
+  
   setSelectedHotel: (hotel) => set({ selectedHotel: hotel }),
   
   setLoading: (isLoading) => set({ isLoading }),